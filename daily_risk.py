@@ -2,8 +2,8 @@ import csv
 from datetime import datetime
 import time
 from transaction_data import TransactionData
-from yahooquery_tester import get_stock_last_price, get_fx_rate, get_option_values
-from typing import Dict, Any, List
+from yahooquery_tester import fetch_quotes
+from typing import Dict, Any, List, Optional, Set, Tuple
 
 def adjust_cad_to_usd(value: float, currency: str, fx_rate: float) -> float:
     return value / fx_rate if currency == 'CAD' else value
@@ -13,52 +13,73 @@ def format_strike_for_symbol(strike):
     return f"{strike_int:08d}"
 
 def get_option_code(ticker: str, expiration: str, option_type: str, strike: float) -> str:
-    expiry = datetime.strptime(expiration, '%Y-%m-%d')
+    expiry = TransactionData.parse_date(expiration)
     expiry_str = expiry.strftime('%y%m%d')
     strike_str = format_strike_for_symbol(strike)
     return f"{ticker}{expiry_str}{option_type[0].upper()}{strike_str}"
 
-def get_live_prices(stock_tickers: List[str], option_data: List[Dict[str, Any]], max_retries: int = 3) -> Dict[str, float]:
+def get_live_prices(stock_tickers: List[str], option_data: List[Dict[str, Any]], currency_pair: str,
+                    max_retries: int = 3) -> Tuple[Dict[str, float], Optional[float]]:
     all_prices = {}
+    fx_rate = None
 
-    # Fetch stock prices
+    # Stock prices, option values and the exchange rate are fetched concurrently
     for attempt in range(max_retries):
         try:
-            stock_prices = get_stock_last_price(stock_tickers)
+            stock_prices, option_prices, (fx_rate, _) = fetch_quotes(stock_tickers, option_data, currency_pair)
             all_prices.update(dict(zip(stock_prices['ticker'], stock_prices['last_price'])))
-            print(f"Successfully fetched prices for {len(stock_tickers)} stocks")
-            break
-        except Exception as e:
-            print(f"Attempt {attempt + 1} failed for stocks: {str(e)}")
-            if attempt == max_retries - 1:
-                print(f"Failed to fetch stock prices after {max_retries} attempts")
-            time.sleep(2 ** attempt)  # Exponential backoff
-
-    # Fetch option prices
-    for attempt in range(max_retries):
-        try:
-            option_prices = get_option_values(option_data)
             for _, row in option_prices.iterrows():
                 key = f"{row['ticker']}_{row['expiration']}_{row['option_type']}_{row['strike']}"
                 all_prices[key] = row['value']
-            print(f"Successfully fetched prices for {len(option_data)} options")
+            print(f"Successfully fetched prices for {len(stock_tickers)} stocks and {len(option_data)} options")
             break
         except Exception as e:
-            print(f"Attempt {attempt + 1} failed for options: {str(e)}")
+            print(f"Attempt {attempt + 1} failed for quotes: {str(e)}")
             if attempt == max_retries - 1:
-                print(f"Failed to fetch option prices after {max_retries} attempts")
+                print(f"Failed to fetch quotes after {max_retries} attempts")
             time.sleep(2 ** attempt)  # Exponential backoff
 
-    return all_prices
+    return all_prices, fx_rate
+
+def collect_quote_requests(transaction_data: TransactionData, current_date: datetime,
+                           stock_tickers: Set[str], option_data: List[Dict[str, Any]]) -> None:
+    """Add the tickers and options of transaction_data's open positions to stock_tickers and option_data."""
+    for acc in transaction_data.get_accounts():
+        for curr in ['USD', 'CAD']:
+            _, stock_breakdown = transaction_data.get_spot_balance(current_date, 'stk_notional', account=acc, currency=curr)
+            _, option_breakdown = transaction_data.get_spot_balance(current_date, 'opt_positions', account=acc, currency=curr)
+
+            for key, notional in stock_breakdown.items():
+                if notional != 0:
+                    _, _, _, ticker = key
+                    stock_tickers.add(ticker)
+
+            for key, shares in option_breakdown.items():
+                if shares != 0:
+                    _, _, _, ticker, option_type, strike, expiry = key
+                    stock_tickers.add(ticker)  # Add underlying stock ticker
+                    option_data.append({
+                        'ticker': ticker,
+                        'expiration': expiry,
+                        'option_type': option_type,
+                        'strike': float(strike)
+                    })
 
 def calculate_daily_risk(user_data_mapping: Dict[str, TransactionData]) -> Dict[str, Any]:
     results = {}
-    fx_rate, _ = get_fx_rate('USDCAD')
+    current_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # Quotes for every user's positions are fetched in one round, together with the exchange rate
+    stock_tickers = set()
+    option_data = []
+    for transaction_data in user_data_mapping.values():
+        collect_quote_requests(transaction_data, current_date, stock_tickers, option_data)
+    print(f"Fetching live prices for {len(stock_tickers)} stocks and {len(option_data)} options")
+    live_prices, fx_rate = get_live_prices(list(stock_tickers), option_data, 'USDCAD')
     print(f"Current USD/CAD exchange rate: {fx_rate}")
 
     for user_id, transaction_data in user_data_mapping.items():
         print(f"\nCalculating daily risk for user: {user_id}")
-        current_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         accounts = transaction_data.get_accounts()
         
         # Calculate temporary cash
@@ -126,35 +147,6 @@ def calculate_daily_risk(user_data_mapping: Dict[str, TransactionData]) -> Dict[
         total_notional = stock_notional + option_notional
         print(f"Total outstanding notional: ${total_notional:.2f}")
 
-        # Prepare data for live price fetching
-        stock_tickers = set()
-        option_data = []
-        
-        for acc in accounts:
-            for curr in ['USD', 'CAD']:
-                _, stock_breakdown = transaction_data.get_spot_balance(current_date, 'stk_notional', account=acc, currency=curr)
-                _, option_breakdown = transaction_data.get_spot_balance(current_date, 'opt_positions', account=acc, currency=curr)
-
-                for key, notional in stock_breakdown.items():
-                    if notional != 0:
-                        _, _, _, ticker = key
-                        stock_tickers.add(ticker)
-
-                for key, shares in option_breakdown.items():
-                    if shares != 0:
-                        _, _, _, ticker, option_type, strike, expiry = key
-                        stock_tickers.add(ticker)  # Add underlying stock ticker
-                        option_data.append({
-                            'ticker': ticker,
-                            'expiration': expiry,
-                            'option_type': option_type,
-                            'strike': float(strike)
-                        })
-
-        print(f"Fetching live prices for {len(stock_tickers)} stocks and {len(option_data)} options")
-        # Fetch live prices
-        live_prices = get_live_prices(list(stock_tickers), option_data)
-
         # Calculate Risk %
         used_bp = 0
         for acc in accounts:
@@ -230,9 +222,8 @@ def calculate_daily_risk(user_data_mapping: Dict[str, TransactionData]) -> Dict[
     return results
 
 def get_market_data():
-    fx_rate, _ = get_fx_rate('USDCAD')
     tickers = ['^VIX', '^GSPC', '^IXIC', '^DJI', 'GC=F', 'CL=F']
-    market_data = get_stock_last_price(tickers)
+    market_data, _, (fx_rate, _) = fetch_quotes(tickers, [], 'USDCAD')
     market_dict = {
         'USDCAD': fx_rate,
         'VIX': market_data.loc[market_data['ticker'] == '^VIX', 'last_price'].iloc[0],
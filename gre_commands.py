@@ -5,7 +5,7 @@ from typing import Dict, Tuple, List
 from transaction_data import TransactionData
 from collections import defaultdict
 import math
-from yahooquery_tester import get_stock_last_price, get_option_values, get_fx_rate
+from yahooquery_tester import get_fx_rate, fetch_quotes
 
 # Configuration
 FX_RATE, FX_ERROR = get_fx_rate('USDCAD')
@@ -409,7 +409,7 @@ def positions_command(transaction_data: TransactionData) -> str:
         if shares != 0:
             account, currency, margin, ticker, option_type, strike, expiry = key
             strike = float(strike)
-            expiry_date = datetime.strptime(expiry, '%Y-%m-%d')
+            expiry_date = TransactionData.parse_date(expiry)
             notional = abs(shares * strike)
             notional_usd = adjust_cad_to_usd(notional) if currency == 'CAD' else notional
             strike_str = f"{strike:.0f}" if strike.is_integer() else f"{strike:.1f}"
@@ -438,19 +438,15 @@ def positions_command(transaction_data: TransactionData) -> str:
             print(f"Added option info: {option_info}")
     print(f"Total notional (stocks + options): {total_notional}")
 
-    print("\nGetting stock prices")
-    stock_prices = get_stock_last_price(list(all_tickers))
+    print("\nGetting stock prices, option values and FX rate")
+    stock_prices, option_prices, (FX_RATE, fx_error) = fetch_quotes(list(all_tickers), all_options, 'USDCAD')
     stock_prices_dict = dict(zip(stock_prices['ticker'], stock_prices['last_price']))
     print(f"Stock prices: {stock_prices_dict}")
     
-    print("\nGetting option values")
-    option_prices = get_option_values(all_options)
     option_prices_dict = {(row['ticker'], row['expiration'], row['option_type'], row['strike']): row['value'] 
                           for _, row in option_prices.iterrows()}
     print(f"Option prices: {option_prices_dict}")
     
-    print("\nGetting FX rate")
-    FX_RATE, fx_error = get_fx_rate('USDCAD')
     print(f"FX rate: {FX_RATE}, Error: {fx_error}")
     
     def calculate_stock_bp(pos):
@@ -585,13 +581,11 @@ def account_summary_command(transaction_data: TransactionData) -> str:
     print(f"All tickers: {all_tickers}")
     print(f"All options: {all_options}")
 
-    print("\nGetting stock prices")
-    stock_prices = get_stock_last_price(list(all_tickers))
+    print("\nGetting stock prices and option values")
+    stock_prices, option_prices, _ = fetch_quotes(list(all_tickers), all_options)
     stock_prices_dict = dict(zip(stock_prices['ticker'], stock_prices['last_price']))
     print(f"Stock prices: {stock_prices_dict}")
 
-    print("\nGetting option values")
-    option_prices = get_option_values(all_options)
     option_prices_dict = {(row['ticker'], row['expiration'], row['option_type'], row['strike']): row['value'] 
                           for _, row in option_prices.iterrows()}
     print(f"Option prices: {option_prices_dict}")
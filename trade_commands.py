@@ -1,48 +1,111 @@
+# Kept in plain CPython on purpose: this module is string formatting, dict building and
+# Discord I/O, which numba cannot compile and would only run slower in object mode.
 import discord
-import csv
 import asyncio
 import logging
-import configparser
-import os
 import re
+import weakref
 from discord import app_commands, ui
 from discord.ui import Select, View, Modal, TextInput
 from transaction_data import TransactionData
-from typing import Dict, List, Any, Union
-from datetime import datetime
-
-logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
-
-def parse_number(value: str) -> float:
+from transaction_csv import FIELDNAMES, append_transactions, read_last_transaction, delete_last_transaction
+from typing import Dict, List, Any, Union, Iterable, Optional, Callable, Awaitable
+from datetime import date
+from dataclasses import dataclass, field
+
+# Fixed columns of stock rows and of rows that hold no position (cash, interest, gains);
+# built from FIELDNAMES so transactions spread from them keep the CSV column order
+_STOCK_ROW = {**dict.fromkeys(FIELDNAMES, ''), 'Trans Type': 'Stk', 'Strike/Price': '0', 'Expiry': '9999-12-31'}
+_NO_CONTRACT_ROW = {**dict.fromkeys(FIELDNAMES, ''), 'Shares': '0', 'Strike/Price': '0', 'Expiry': '9999-12-31'}
+
+# Discord rejects a Select menu with more than 25 options
+MAX_SELECT_OPTIONS = 25
+# TransactionData -> handler class -> (version, options, SelectOptions) built at that version;
+# weakly keyed so data objects replaced by /gre refresh drop out with their entries
+_select_options_cache: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+# TransactionData -> (version, positions) built by get_outstanding_positions
+_positions_cache: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+# Shape of the YYYY-MM-DD dates entered in the forms; date.fromisoformat checks the day exists
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# Characters dropped from numeric strings before parsing ("$1,234.50" -> "1234.50")
+_NUMBER_STRIP = str.maketrans('', '', ',$')
+
+# Accepted shape of whole share counts, checked before converting
+_INT_RE = re.compile(r'^\s*-?\d+\s*$')
+
+# Accepted form inputs for currencies, yes/no answers and margin rates
+_VALID_CURRENCIES = frozenset(('CAD', 'USD'))
+_TRUE_TOKENS = frozenset(('yes', 'y', 'true', '1'))
+_VALID_MARGINS = frozenset((0.0, 0.3, 0.5, 1.0))
+
+def _parse_shares(value: str) -> int:
+    """Parse a whole number of shares entered in a form."""
+    if not _INT_RE.match(value):
+        raise ValueError(f"Invalid number of shares '{value}', expected a whole number")
+    return int(value)
+
+def _check_date(value: str) -> None:
+    """Reject a form date that is not a real YYYY-MM-DD day, e.g. 2023-02-31."""
     try:
-        return float(value.replace(',', '').replace('$', '').strip())
+        if _DATE_RE.match(value):
+            date.fromisoformat(value)
+            return
     except ValueError:
-        print(f"Warning: Could not parse '{value}' as a number. Using 0.")
-        return 0
+        pass
+    raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+def _parse_margin(value: str) -> float:
+    """Parse a margin rate entered in a form, rejecting anything outside _VALID_MARGINS."""
+    margin = float(value)
+    if margin not in _VALID_MARGINS:
+        raise ValueError(f"Invalid margin '{value}', expected 0, 0.3, 0.5, or 1")
+    return margin
+
+# (date, "YYYY-MM-DD") behind today_str, refreshed when the day changes
+_today = (None, '')
+
+def today_str() -> str:
+    """Today's date as YYYY-MM-DD, used as the default in the forms."""
+    global _today
+    today = date.today()
+    if today != _today[0]:
+        _today = (today, today.isoformat())
+    return _today[1]
+
+def _fmt_currency(value: float) -> str:
+    """Format a number as a dollar amount, e.g. $4,000.00."""
+    return f"${value:,.2f}"
+
+def _fmt_qty(value: float) -> str:
+    """Format a share count or price, dropping the decimals for whole numbers."""
+    if value % 1:
+        return f"{value:.2f}"
+    return f"{int(value)}"
+
+# Position dataclass
+@dataclass(slots=True)
+class Position:
+    """An open option or stock position built by get_outstanding_positions."""
+    acct: str
+    ticker: str
+    currency: str
+    margin: str
+    type: str
+    shares: float
+    strike_price: str
+    expiry: str
+    net_gains_raw: float = 0.0
+    label: str = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.label = f"{self.ticker} ({self.type}) @ {self.strike_price} on {self.expiry} x {abs(self.shares)}"
 
-def parse_currency(value: str) -> float:
-    """Parse a currency string into a float."""
-    return float(re.sub(r'[^\d.-]', '', value))
-
-def format_number(value: Union[str, int, float], is_currency: bool = False) -> str:
-    try:
-        # If value is a string, try to convert it to float
-        if isinstance(value, str):
-            value = float(value.replace(',', '').replace('$', '').strip())
-        
-        # Now value should be either int or float
-        if is_currency:
-            return f"${value:,.2f}"
-        elif isinstance(value, int) or value.is_integer():
-            return f"{int(value)}"
-        else:
-            return f"{value:.2f}"
-    except ValueError:
-        # If conversion fails, return the original string
-        return str(value)
-    
 # Base TradeHandler class
 class TradeHandler:
+    __slots__ = ('mz_data',)
+
     def __init__(self, mz_data: TransactionData):
         self.mz_data = mz_data
 
@@ -50,23 +113,30 @@ class TradeHandler:
         options = await self.get_options()
         await self.show_selection(interaction, options)
 
-    async def get_options(self) -> List[Dict[str, Any]]:
+    async def get_options(self) -> Iterable[Dict[str, Any]]:
         raise NotImplementedError("Subclasses must implement get_options method")
 
-    async def show_selection(self, interaction: discord.Interaction, options: List[Dict[str, Any]]):
-        select = discord.ui.Select(
-            placeholder="Choose an option",
-            options=[discord.SelectOption(label=option['label'], value=str(i)) for i, option in enumerate(options)]
-        )
-
-        async def select_callback(select_interaction: discord.Interaction):
-            option_id = int(select_interaction.data["values"][0])
-            selected_option = options[option_id]
-            await self.show_form(select_interaction, selected_option)
-
-        select.callback = select_callback
-        view = discord.ui.View()
-        view.add_item(select)
+    def build_select_options(self, options: Iterable[Dict[str, Any]]):
+        # Reuse the SelectOptions built while the data version was unchanged
+        version = self.mz_data.version
+        handler_cache = _select_options_cache.setdefault(self.mz_data, {})
+        cached = handler_cache.get(type(self))
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        # Single pass: materialize the options and their SelectOptions together
+        options_list = []
+        select_options = []
+        for i, option in enumerate(options):
+            options_list.append(option)
+            select_options.append(discord.SelectOption(label=option['label'], value=str(i)))
+
+        handler_cache[type(self)] = (version, options_list, select_options)
+        return options_list, select_options
+
+    async def show_selection(self, interaction: discord.Interaction, options: Iterable[Dict[str, Any]]):
+        options, select_options = self.build_select_options(options)
+        view = PaginatedSelectView(self.show_form, options, select_options, placeholder="Choose an option")
         await interaction.followup.send("Please select an option:", view=view)
 
     async def show_form(self, interaction: discord.Interaction, selected_option: Dict[str, Any]):
@@ -75,52 +145,134 @@ class TradeHandler:
     async def process_form(self, interaction: discord.Interaction, form_data: Dict[str, Any]):
         raise NotImplementedError("Subclasses must implement process_form method")
 
+# PaginatedSelectView class
+class _OptionSelect(discord.ui.Select):
+    """Select whose values index into the options held by its PaginatedSelectView."""
+
+    async def callback(self, interaction: discord.Interaction):
+        view = self.view
+        await view.on_select(interaction, view.options[int(interaction.data["values"][0])])
+
+class PaginatedSelectView(discord.ui.View):
+    """Select menu over any number of options, shown MAX_SELECT_OPTIONS at a time."""
+
+    def __init__(self, on_select: Callable[[discord.Interaction, Dict[str, Any]], Awaitable[None]],
+                 options: List[Dict[str, Any]], select_options: List[discord.SelectOption], placeholder: str):
+        super().__init__()
+        self.on_select = on_select
+        self.options = options
+        self.select_options = select_options
+        self.placeholder = placeholder
+        self.page = 0
+        self.page_count = max(1, (len(select_options) + MAX_SELECT_OPTIONS - 1) // MAX_SELECT_OPTIONS)
+
+        self.select = _OptionSelect(placeholder=placeholder, row=0)
+        self.add_item(self.select)
+
+        if self.page_count == 1:
+            self.remove_item(self.previous_page)
+            self.remove_item(self.next_page)
+        self.show_page()
+
+    def show_page(self):
+        # Option values are indices into self.options, so they stay valid on every page
+        start = self.page * MAX_SELECT_OPTIONS
+        self.select.options = self.select_options[start:start + MAX_SELECT_OPTIONS]
+        if self.page_count > 1:
+            self.select.placeholder = f"{self.placeholder} (page {self.page + 1}/{self.page_count})"
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page == self.page_count - 1
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.grey, row=1)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        self.show_page()
+        await interaction.response.edit_message(view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.grey, row=1)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        self.show_page()
+        await interaction.response.edit_message(view=self)
+
 # ClosePositionHandler class and Modal
 class ClosePositionHandler(TradeHandler):
-    async def get_options(self) -> List[Dict[str, Any]]:
+    __slots__ = ()
+
+    async def get_options(self) -> Iterable[Dict[str, Any]]:
         positions = get_outstanding_positions(self.mz_data)
-        return [{
-            'label': f"{pos['Ticker']} ({pos['Type']}) @ {pos['Strike/Price']} on {pos['Expiry']} x {abs(pos['Shares'])}",
+        return ({
+            'label': pos.label,
             'value': pos
-        } for pos in positions]
+        } for pos in positions)
+
+    async def show_selection(self, interaction: discord.Interaction, options: Iterable[Dict[str, Any]]):
+        options, select_options = self.build_select_options(options)
+        if len(options) <= MAX_SELECT_OPTIONS:
+            view = PaginatedSelectView(self.show_form, options, select_options, placeholder="Choose an option")
+            await interaction.followup.send("Please select an option:", view=view)
+            return
+
+        # Too many positions for one menu: pick a ticker first, then one of its positions
+        by_ticker: Dict[str, List[Dict[str, Any]]] = {}
+        for option in options:
+            by_ticker.setdefault(option['value'].ticker, []).append(option)
+        ticker_options = [{
+            'label': f"{ticker} ({len(by_ticker[ticker])} positions)",
+            'value': by_ticker[ticker]
+        } for ticker in sorted(by_ticker)]
+        ticker_select_options = [discord.SelectOption(label=option['label'], value=str(i))
+                                 for i, option in enumerate(ticker_options)]
+        view = PaginatedSelectView(self.show_ticker_positions, ticker_options, ticker_select_options,
+                                   placeholder="Choose a ticker")
+        await interaction.followup.send("Please select a ticker:", view=view)
+
+    async def show_ticker_positions(self, interaction: discord.Interaction, selected_option: Dict[str, Any]):
+        options = selected_option['value']
+        select_options = [discord.SelectOption(label=option['label'], value=str(i))
+                          for i, option in enumerate(options)]
+        view = PaginatedSelectView(self.show_form, options, select_options, placeholder="Choose a position")
+        await interaction.response.send_message("Please select a position:", view=view)
 
     async def show_form(self, interaction: discord.Interaction, selected_option: Dict[str, Any]):
-        modal = ClosePositionModal(selected_option['value'])
+        modal = ClosePositionModal(self, selected_option['value'])
         await interaction.response.send_modal(modal)
 
     async def process_form(self, interaction: discord.Interaction, form_data: Dict[str, Any]):
         position = form_data['position']
-        date = datetime.strptime(form_data['date'], '%Y-%m-%d')
-        shares = int(form_data['shares'])
+        date_str = form_data['date']
+        _check_date(date_str)
+        shares = _parse_shares(form_data['shares'])
         closing_value = float(form_data['closing_value'])
         notes = form_data['notes']
 
-        if shares > abs(position['Shares']):
-            raise ValueError(f"Cannot close more shares than outstanding ({abs(position['Shares'])})")
+        if shares > abs(position.shares):
+            raise ValueError(f"Cannot close more shares than outstanding ({abs(position.shares)})")
 
-        if position['Type'] == 'Stk':
-            transactions = create_stock_closing_transactions(position, date, shares, closing_value, notes)
+        if position.type == 'Stk':
+            transactions = create_stock_closing_transactions(position, date_str, shares, closing_value, notes)
         else:
-            transactions = [create_option_closing_transaction(position, date, shares, closing_value, notes)]
+            transactions = [create_option_closing_transaction(position, date_str, shares, closing_value, notes)]
 
         return transactions
 
 class ClosePositionModal(discord.ui.Modal):
-    def __init__(self, position: Dict[str, Any]):
-        super().__init__(title=f"Close Position: {position['Ticker']}")
+    def __init__(self, handler: ClosePositionHandler, position: Position):
+        super().__init__(title=f"Close Position: {position.ticker}")
+        self.handler = handler
         self.position = position
 
         self.add_item(discord.ui.TextInput(
             label="Transaction Date (YYYY-MM-DD)", 
             placeholder="e.g. 2023-07-15",
-            default=datetime.now().strftime('%Y-%m-%d')
+            default=today_str()
         ))
         self.add_item(discord.ui.TextInput(
-            label=f"Number of Shares (max: {abs(position['Shares'])})",
-            placeholder=f"Enter up to {abs(position['Shares'])}"
+            label=f"Number of Shares (max: {abs(position.shares)})",
+            placeholder=f"Enter up to {abs(position.shares)}"
         ))
         
-        if position['Type'] == 'Stk':
+        if position.type == 'Stk':
             self.add_item(discord.ui.TextInput(label="Closing Gains", placeholder="e.g. 500.25"))
         else:
             self.add_item(discord.ui.TextInput(label="Closing Costs", placeholder="e.g. 50.25"))
@@ -135,19 +287,20 @@ class ClosePositionModal(discord.ui.Modal):
             'closing_value': self.children[2].value,
             'notes': self.children[3].value
         }
-        handler = ClosePositionHandler(interaction.client.mz_data)
         try:
-            transactions = await handler.process_form(interaction, form_data)
+            transactions = await self.handler.process_form(interaction, form_data)
             transactions_display = "\n\n".join([format_transaction_display(t) for t in transactions])
             await interaction.response.send_message(
                 f"New transaction(s) to be added:\n```\n{transactions_display}\n```\nDo you want to add these transactions?",
-                view=ConfirmView(transactions)
+                view=ConfirmView(self.handler.mz_data, transactions)
             )
         except ValueError as e:
             await interaction.response.send_message(f"Error in input: {str(e)}", ephemeral=True)
 
 # AddTradeHandler class and Modal
 class AddTradeHandler(TradeHandler):
+    __slots__ = ('acct', 'ticker', 'shares', 'currency')
+
     def __init__(self, mz_data: TransactionData, acct: str, ticker: str, shares: int, currency: str):
         super().__init__(mz_data)
         self.acct = acct
@@ -159,24 +312,8 @@ class AddTradeHandler(TradeHandler):
         await self.show_trade_type_selection(interaction)
 
     async def show_trade_type_selection(self, interaction: discord.Interaction):
-        select = Select(
-            placeholder="Choose trade type",
-            options=[
-                discord.SelectOption(label="Put Option", value="put"),
-                discord.SelectOption(label="Stock Purchase", value="stock")
-            ]
-        )
-
-        async def select_callback(select_interaction: discord.Interaction):
-            trade_type = select_interaction.data["values"][0]
-            if trade_type == "put":
-                await select_interaction.response.send_modal(PutOptionModal(self))
-            else:
-                await select_interaction.response.send_modal(StockPurchaseModal(self))
-
-        select.callback = select_callback
         view = View()
-        view.add_item(select)
+        view.add_item(_TradeTypeSelect(self))
         
         # Use followup instead of response
         await interaction.followup.send("Please select the type of trade:", view=view)
@@ -189,8 +326,8 @@ class AddTradeHandler(TradeHandler):
             'Margin %': f"{form_data['margin']:.1f}",  # Format as 0.3, not 30.0%
             'Date': form_data['date'],
             'Trans Type': 'Put',
-            'Shares': format_number(self.shares),
-            'Strike/Price': format_number(form_data['strike']),
+            'Shares': _fmt_qty(self.shares),
+            'Strike/Price': _fmt_qty(form_data['strike']),
             'Expiry': form_data['expiry'],
             'Net Gains': f"{form_data['net_gains']:,.2f}",  # Format as 4,000.00, not $4,000.00
             'Notes': ''
@@ -198,15 +335,13 @@ class AddTradeHandler(TradeHandler):
 
     def create_stock_purchase_transaction(self, form_data: Dict[str, Any]) -> Dict[str, Any]:
         return {
+            **_STOCK_ROW,
             'Acct': self.acct,
             'Ticker': self.ticker,
             'Currency': self.currency,
             'Margin %': f"{form_data['margin']:.1f}",  # Format as 0.3, not 30.0%
             'Date': form_data['date'],
-            'Trans Type': 'Stk',
-            'Shares': format_number(self.shares),
-            'Strike/Price': '0',
-            'Expiry': '9999-12-31',
+            'Shares': _fmt_qty(self.shares),
             'Net Gains': f"{-form_data['net_purchase_cost']:,.2f}",  # Format as -4,000.00, not $-4,000.00
             'Notes': ''
         }
@@ -215,8 +350,25 @@ class AddTradeHandler(TradeHandler):
         transaction_display = format_transaction_display(transaction)
         await interaction.response.send_message(
             f"New transaction to be added:\n```\n{transaction_display}\n```\nDo you want to add this transaction?",
-            view=ConfirmView([transaction])
+            view=ConfirmView(self.mz_data, [transaction])
+        )
+
+class _TradeTypeSelect(Select):
+    def __init__(self, handler: AddTradeHandler):
+        super().__init__(
+            placeholder="Choose trade type",
+            options=[
+                discord.SelectOption(label="Put Option", value="put"),
+                discord.SelectOption(label="Stock Purchase", value="stock")
+            ]
         )
+        self.handler = handler
+
+    async def callback(self, interaction: discord.Interaction):
+        if interaction.data["values"][0] == "put":
+            await interaction.response.send_modal(PutOptionModal(self.handler))
+        else:
+            await interaction.response.send_modal(StockPurchaseModal(self.handler))
 
 class PutOptionModal(Modal):
     def __init__(self, handler: AddTradeHandler):
@@ -225,7 +377,7 @@ class PutOptionModal(Modal):
 
         self.add_item(TextInput(
             label="Transaction Date",
-            default=datetime.now().strftime('%Y-%m-%d'),
+            default=today_str(),
             style=discord.TextStyle.short
         ))
         self.add_item(TextInput(
@@ -250,10 +402,10 @@ class PutOptionModal(Modal):
         try:
             form_data = {
                 'date': self.children[0].value,
-                'margin': float(self.children[1].value),  # Convert percentage to decimal
+                'margin': _parse_margin(self.children[1].value),
                 'strike': float(self.children[2].value),
                 'expiry': self.children[3].value,
-                'net_gains': float(self.children[4].value.replace('$', ''))  # Remove $ and commas
+                'net_gains': float(self.children[4].value.translate(_NUMBER_STRIP))  # Remove $ and commas
             }
             transaction = self.handler.create_put_option_transaction(form_data)
             await self.handler.confirm_transaction(interaction, transaction)
@@ -267,7 +419,7 @@ class StockPurchaseModal(Modal):
 
         self.add_item(TextInput(
             label="Transaction Date",
-            default=datetime.now().strftime('%Y-%m-%d'),
+            default=today_str(),
             style=discord.TextStyle.short
         ))
         self.add_item(TextInput(
@@ -284,8 +436,8 @@ class StockPurchaseModal(Modal):
         try:
             form_data = {
                 'date': self.children[0].value,
-                'margin': float(self.children[1].value),  # Convert percentage to decimal
-                'net_purchase_cost': float(self.children[2].value.replace('$', ''))  # Remove $ and commas
+                'margin': _parse_margin(self.children[1].value),
+                'net_purchase_cost': float(self.children[2].value.translate(_NUMBER_STRIP))  # Remove $ and commas
             }
             transaction = self.handler.create_stock_purchase_transaction(form_data)
             await self.handler.confirm_transaction(interaction, transaction)
@@ -294,8 +446,10 @@ class StockPurchaseModal(Modal):
 
 # LastTradeHandler
 class LastTradeHandler(TradeHandler):
+    __slots__ = ()
+
     async def handle(self, interaction: discord.Interaction):
-        last_trade = self.get_last_trade()
+        last_trade = await self.get_last_trade()
         if last_trade:
             transaction_display = format_transaction_display(last_trade)
             content = f"Last trade:\n```\n{transaction_display}\n```"
@@ -312,24 +466,23 @@ class LastTradeHandler(TradeHandler):
         except Exception as e:
             logging.error(f"Error in LastTradeHandler: {str(e)}")
 
-    def get_last_trade(self) -> Dict[str, Any]:
+    async def get_last_trade(self) -> Dict[str, Any]:
         try:
-            with open(self.mz_data.csv_path, 'r', newline='', encoding='utf-8-sig') as csvfile:
-                reader = csv.DictReader(csvfile)
-                trades = list(reader)
-                return trades[-1] if trades else None
+            return await asyncio.to_thread(read_last_transaction, self.mz_data.csv_path)
         except Exception as e:
             logging.error(f"Error reading CSV file: {str(e)}")
             return None
 
 # DeleteLastTradeHandler Class and Modal        
 class DeleteLastTradeHandler(TradeHandler):
+    __slots__ = ()
+
     async def handle(self, interaction: discord.Interaction):
-        last_trade = self.get_last_trade()
+        last_trade = await self.get_last_trade()
         if last_trade:
             transaction_display = format_transaction_display(last_trade)
             content = f"Last trade to be deleted:\n```\n{transaction_display}\n```\nDo you want to delete this trade?"
-            view = DeleteConfirmView(self.mz_data.csv_path, last_trade)
+            view = DeleteConfirmView(self.mz_data, last_trade)
         else:
             content = "No trades found to delete."
             view = None
@@ -344,30 +497,32 @@ class DeleteLastTradeHandler(TradeHandler):
         except Exception as e:
             logging.error(f"Error in DeleteLastTradeHandler: {str(e)}")
 
-    def get_last_trade(self) -> Dict[str, Any]:
+    async def get_last_trade(self) -> Dict[str, Any]:
         try:
-            with open(self.mz_data.csv_path, 'r', newline='', encoding='utf-8-sig') as csvfile:
-                reader = csv.DictReader(csvfile)
-                trades = list(reader)
-                return trades[-1] if trades else None
+            return await asyncio.to_thread(read_last_transaction, self.mz_data.csv_path)
         except Exception as e:
             logging.error(f"Error reading CSV file: {str(e)}")
             return None
 
 class DeleteConfirmView(discord.ui.View):
-    def __init__(self, csv_path: str, last_trade: Dict[str, Any]):
+    def __init__(self, mz_data: TransactionData, last_trade: Dict[str, Any]):
         super().__init__()
-        self.csv_path = csv_path
+        self.mz_data = mz_data
         self.last_trade = last_trade
 
     @discord.ui.button(label="Confirm", style=discord.ButtonStyle.green)
     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
-            self.delete_last_trade()
+            await asyncio.to_thread(self.delete_last_trade)
             await interaction.response.send_message("Last trade deleted successfully.")
+            # The deleted row is still folded into the balances; rebuild them from the CSV
+            await asyncio.to_thread(self.mz_data.reload)
         except Exception as e:
             logging.error(f"Error in delete confirmation: {str(e)}")
-            await interaction.response.send_message("An error occurred while deleting the trade.")
+            if interaction.response.is_done():
+                await interaction.followup.send("An error occurred while reloading the trades.")
+            else:
+                await interaction.response.send_message("An error occurred while deleting the trade.")
         self.stop()
 
     @discord.ui.button(label="Cancel", style=discord.ButtonStyle.red)
@@ -377,62 +532,56 @@ class DeleteConfirmView(discord.ui.View):
 
     def delete_last_trade(self):
         try:
-            with open(self.csv_path, 'r', newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                trades = list(reader)
-                trades.pop()  # Remove the last trade
-
-            with open(self.csv_path, 'w', newline='') as csvfile:
-                fieldnames = reader.fieldnames
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(trades)
+            delete_last_transaction(self.mz_data.csv_path, self.last_trade)
         except Exception as e:
             logging.error(f"Error deleting last trade: {str(e)}")
             raise
 
 # CoveredCallHandler Class and Modal
 class CovCallHandler(TradeHandler):
-    async def get_options(self) -> List[Dict[str, Any]]:
+    __slots__ = ()
+
+    async def get_options(self) -> Iterable[Dict[str, Any]]:
         positions = get_outstanding_positions(self.mz_data)
-        return [{
-            'label': f"{pos['Ticker']} @ {pos['Strike/Price']} x {abs(pos['Shares'])}",
+        return ({
+            'label': f"{pos.ticker} @ {pos.strike_price} x {abs(pos.shares)}",
             'value': pos
-        } for pos in positions if pos['Type'] == 'Stk']
+        } for pos in positions if pos.type == 'Stk')
 
     async def show_form(self, interaction: discord.Interaction, selected_option: Dict[str, Any]):
-        modal = CovCallModal(selected_option['value'])
+        modal = CovCallModal(self, selected_option['value'])
         await interaction.response.send_modal(modal)
 
     async def process_form(self, interaction: discord.Interaction, form_data: Dict[str, Any]):
         position = form_data['position']
         transaction = {
-            'Acct': position['Acct'],
-            'Ticker': position['Ticker'],
-            'Currency': position['Currency'],
-            'Margin %': position['Margin %'],
+            'Acct': position.acct,
+            'Ticker': position.ticker,
+            'Currency': position.currency,
+            'Margin %': position.margin,
             'Date': form_data['date'],
             'Trans Type': 'Int / Tax',
-            'Shares': format_number(form_data['shares']),
-            'Strike/Price': format_number(form_data['strike']),
+            'Shares': _fmt_qty(form_data['shares']),
+            'Strike/Price': _fmt_qty(form_data['strike']),
             'Expiry': form_data['expiry'],
-            'Net Gains': format_number(form_data['net_gains']),
+            'Net Gains': _fmt_qty(form_data['net_gains']),
             'Notes': 'Selling Covered Calls'
         }
         return [transaction]
 
 class CovCallModal(discord.ui.Modal):
-    def __init__(self, position: Dict[str, Any]):
-        super().__init__(title=f"Covered Call: {position['Ticker']}")
+    def __init__(self, handler: CovCallHandler, position: Position):
+        super().__init__(title=f"Covered Call: {position.ticker}")
+        self.handler = handler
         self.position = position
 
         self.add_item(discord.ui.TextInput(
             label="Transaction Date (YYYY-MM-DD)", 
-            default=datetime.now().strftime('%Y-%m-%d')
+            default=today_str()
         ))
         self.add_item(discord.ui.TextInput(
-            label=f"Number of Shares (max: {abs(position['Shares'])})",
-            placeholder=f"Enter up to {abs(position['Shares'])}"
+            label=f"Number of Shares (max: {abs(position.shares)})",
+            placeholder=f"Enter up to {abs(position.shares)}"
         ))
         self.add_item(discord.ui.TextInput(
             label="Strike Price",
@@ -452,36 +601,37 @@ class CovCallModal(discord.ui.Modal):
             form_data = {
                 'position': self.position,
                 'date': self.children[0].value,
-                'shares': int(self.children[1].value),
+                'shares': _parse_shares(self.children[1].value),
                 'strike': float(self.children[2].value),
                 'expiry': self.children[3].value,
-                'net_gains': float(self.children[4].value.replace('$', '').replace(',', ''))
+                'net_gains': float(self.children[4].value.translate(_NUMBER_STRIP))
             }
             
-            if form_data['shares'] > abs(self.position['Shares']):
-                raise ValueError(f"Cannot sell more calls than shares owned ({abs(self.position['Shares'])})")
+            if form_data['shares'] > abs(self.position.shares):
+                raise ValueError(f"Cannot sell more calls than shares owned ({abs(self.position.shares)})")
             
-            handler = CovCallHandler(interaction.client.mz_data)
-            transactions = await handler.process_form(interaction, form_data)
+            transactions = await self.handler.process_form(interaction, form_data)
             transactions_display = "\n\n".join([format_transaction_display(t) for t in transactions])
             await interaction.response.send_message(
                 f"New transaction(s) to be added:\n```\n{transactions_display}\n```\nDo you want to add these transactions?",
-                view=ConfirmView(transactions)
+                view=ConfirmView(self.handler.mz_data, transactions)
             )
         except ValueError as e:
             await interaction.response.send_message(f"Error in input: {str(e)}", ephemeral=True)
 
 # AssignedHandler Class and Modal
 class AssignedHandler(TradeHandler):
-    async def get_options(self) -> List[Dict[str, Any]]:
+    __slots__ = ()
+
+    async def get_options(self) -> Iterable[Dict[str, Any]]:
         positions = get_outstanding_positions(self.mz_data)
-        return [{
-            'label': f"{pos['Ticker']} ({pos['Type']}) @ {pos['Strike/Price']} on {pos['Expiry']} x {abs(pos['Shares'])}",
+        return ({
+            'label': pos.label,
             'value': pos
-        } for pos in positions if pos['Type'] in ['Put', 'Call']]
+        } for pos in positions if pos.type in ['Put', 'Call'])
 
     async def show_form(self, interaction: discord.Interaction, selected_option: Dict[str, Any]):
-        modal = AssignedModal(selected_option['value'])
+        modal = AssignedModal(self, selected_option['value'])
         await interaction.response.send_modal(modal)
 
     async def process_form(self, interaction: discord.Interaction, form_data: Dict[str, Any]):
@@ -489,48 +639,47 @@ class AssignedHandler(TradeHandler):
         
         # First row: Close the option position
         option_close_transaction = {
-            'Acct': position['Acct'],
-            'Ticker': position['Ticker'],
-            'Currency': position['Currency'],
-            'Margin %': position['Margin %'],
+            'Acct': position.acct,
+            'Ticker': position.ticker,
+            'Currency': position.currency,
+            'Margin %': position.margin,
             'Date': form_data['date'],
-            'Trans Type': position['Type'],
-            'Shares': format_number(-form_data['shares']),
-            'Strike/Price': position['Strike/Price'],
-            'Expiry': position['Expiry'],
+            'Trans Type': position.type,
+            'Shares': _fmt_qty(-form_data['shares']),
+            'Strike/Price': position.strike_price,
+            'Expiry': position.expiry,
             'Net Gains': '0',
             'Notes': 'Option assigned'
         }
         
         # Second row: New stock position
         stock_transaction = {
-            'Acct': position['Acct'],
-            'Ticker': position['Ticker'],
-            'Currency': position['Currency'],
-            'Margin %': position['Margin %'],
+            **_STOCK_ROW,
+            'Acct': position.acct,
+            'Ticker': position.ticker,
+            'Currency': position.currency,
+            'Margin %': position.margin,
             'Date': form_data['date'],
-            'Trans Type': 'Stk',
-            'Shares': format_number(form_data['shares']),
-            'Strike/Price': '0',
-            'Expiry': '9999-12-31',
-            'Net Gains': format_number(-form_data['purchase_cost']),
+            'Shares': _fmt_qty(form_data['shares']),
+            'Net Gains': _fmt_qty(-form_data['purchase_cost']),
             'Notes': 'Stock from assigned option'
         }
         
         return [option_close_transaction, stock_transaction]
 
 class AssignedModal(discord.ui.Modal):
-    def __init__(self, position: Dict[str, Any]):
-        super().__init__(title=f"Assigned: {position['Ticker']}")
+    def __init__(self, handler: AssignedHandler, position: Position):
+        super().__init__(title=f"Assigned: {position.ticker}")
+        self.handler = handler
         self.position = position
 
         self.add_item(discord.ui.TextInput(
             label="Transaction Date (YYYY-MM-DD)", 
-            default=datetime.now().strftime('%Y-%m-%d')
+            default=today_str()
         ))
         self.add_item(discord.ui.TextInput(
-            label=f"Number of Shares (max: {abs(position['Shares'])})",
-            placeholder=f"Enter up to {abs(position['Shares'])}"
+            label=f"Number of Shares (max: {abs(position.shares)})",
+            placeholder=f"Enter up to {abs(position.shares)}"
         ))
         self.add_item(discord.ui.TextInput(
             label="Purchase Cost",
@@ -542,30 +691,32 @@ class AssignedModal(discord.ui.Modal):
             form_data = {
                 'position': self.position,
                 'date': self.children[0].value,
-                'shares': int(self.children[1].value),
-                'purchase_cost': float(self.children[2].value.replace('$', '').replace(',', ''))
+                'shares': _parse_shares(self.children[1].value),
+                'purchase_cost': float(self.children[2].value.translate(_NUMBER_STRIP))
             }
             
-            if form_data['shares'] > abs(self.position['Shares']):
-                raise ValueError(f"Cannot assign more shares than the option position ({abs(self.position['Shares'])})")
+            if form_data['shares'] > abs(self.position.shares):
+                raise ValueError(f"Cannot assign more shares than the option position ({abs(self.position.shares)})")
             
-            handler = AssignedHandler(interaction.client.mz_data)
-            transactions = await handler.process_form(interaction, form_data)
+            transactions = await self.handler.process_form(interaction, form_data)
             transactions_display = "\n\n".join([format_transaction_display(t) for t in transactions])
             await interaction.response.send_message(
                 f"New transaction(s) to be added:\n```\n{transactions_display}\n```\nDo you want to add these transactions?",
-                view=ConfirmView(transactions)
+                view=ConfirmView(self.handler.mz_data, transactions)
             )
         except ValueError as e:
             await interaction.response.send_message(f"Error in input: {str(e)}", ephemeral=True)
 
 # CashInOutHandler Class and Modal
 class CashInOutHandler(TradeHandler):
+    __slots__ = ()
+
     async def handle(self, interaction: discord.Interaction):
         await self.show_form(interaction)
 
     async def show_form(self, interaction: discord.Interaction):
-        modal = CashInOutModal(self.mz_data)
+        default_account = await get_last_account(self.mz_data.csv_path)
+        modal = CashInOutModal(self, default_account)
         await interaction.response.send_modal(modal)
 
     async def process_form(self, interaction: discord.Interaction, form_data: Dict[str, Any]):
@@ -574,38 +725,35 @@ class CashInOutHandler(TradeHandler):
             raise ValueError(f"Invalid account: {form_data['account']}")
 
         # Validate currency
-        if form_data['currency'] not in ['CAD', 'USD']:
+        if form_data['currency'] not in _VALID_CURRENCIES:
             raise ValueError(f"Invalid currency: {form_data['currency']}")
 
         # Validate permanent investment
-        is_permanent = form_data['is_permanent'].lower() in ['yes', 'y', 'true', '1']
+        is_permanent = form_data['is_permanent'].strip().lower() in _TRUE_TOKENS
 
         transaction = {
+            **_NO_CONTRACT_ROW,
             'Acct': form_data['account'],
             'Ticker': 'GREINV',
             'Currency': form_data['currency'],
             'Margin %': '0',
             'Date': form_data['date'],
             'Trans Type': 'Cash',
-            'Shares': '0',
-            'Strike/Price': '0',
-            'Expiry': '9999-12-31',
-            'Net Gains': format_number(form_data['amount'], is_currency=True),
+            'Net Gains': _fmt_currency(form_data['amount']),
             'Notes': 'Invest - Pre Convert' if is_permanent else 'Margin Cover'
         }
         return [transaction]
 
 class CashInOutModal(discord.ui.Modal):
-    def __init__(self, mz_data: TransactionData):
+    def __init__(self, handler: CashInOutHandler, default_account: Optional[str] = None):
         super().__init__(title="Cash In/Out Transaction")
-        self.mz_data = mz_data
+        self.handler = handler
 
         self.add_item(discord.ui.TextInput(
             label="Transaction Date (YYYY-MM-DD)",
-            default=datetime.now().strftime('%Y-%m-%d')
+            default=today_str()
         ))
 
-        default_account = self.get_last_account()
         self.add_item(discord.ui.TextInput(
             label="Account",
             placeholder="Enter account name",
@@ -627,18 +775,6 @@ class CashInOutModal(discord.ui.Modal):
             placeholder="e.g. 1000.00 or -500.00"
         ))
 
-    def get_last_account(self):
-        try:
-            with open(self.mz_data.csv_path, 'r', newline='', encoding='utf-8-sig') as csvfile:
-                reader = csv.DictReader(csvfile)
-                last_row = None
-                for row in reader:
-                    last_row = row
-                return last_row['Acct'] if last_row else None
-        except Exception as e:
-            logging.error(f"Error reading CSV file: {str(e)}")
-            return None
-
     async def on_submit(self, interaction: discord.Interaction):
         try:
             form_data = {
@@ -646,132 +782,120 @@ class CashInOutModal(discord.ui.Modal):
                 'account': self.children[1].value,
                 'currency': self.children[2].value.upper(),
                 'is_permanent': self.children[3].value,
-                'amount': float(self.children[4].value.replace('$', '').replace(',', ''))
+                'amount': float(self.children[4].value.translate(_NUMBER_STRIP))
             }
             
-            handler = CashInOutHandler(interaction.client.mz_data)
-            transactions = await handler.process_form(interaction, form_data)
+            transactions = await self.handler.process_form(interaction, form_data)
             transactions_display = "\n\n".join([format_transaction_display(t) for t in transactions])
             await interaction.response.send_message(
                 f"New transaction(s) to be added:\n```\n{transactions_display}\n```\nDo you want to add these transactions?",
-                view=ConfirmView(transactions)
+                view=ConfirmView(self.handler.mz_data, transactions)
             )
         except ValueError as e:
             await interaction.response.send_message(f"Error in input: {str(e)}", ephemeral=True)
 
 # RollPositionHandler Class and Modal
 class RollPositionHandler(TradeHandler):
+    __slots__ = ()
+
     async def handle(self, interaction: discord.Interaction):
-        options = await self.get_options()
-        if not options:
+        if not get_outstanding_positions(self.mz_data):
             await interaction.response.send_message("No open positions available to roll.")
             return
 
+        options = await self.get_options()
         await self.show_selection(interaction, options)
 
-    async def get_options(self) -> List[Dict[str, Any]]:
+    async def get_options(self) -> Iterable[Dict[str, Any]]:
         positions = get_outstanding_positions(self.mz_data)
-        return [{
-            'label': f"{pos['Ticker']} ({pos['Type']}) @ {pos['Strike/Price']} on {pos['Expiry']} x {abs(float(pos['Shares']))}",
+        return ({
+            'label': pos.label,
             'value': pos
-        } for pos in positions]
-
-    async def show_selection(self, interaction: discord.Interaction, options: List[Dict[str, Any]]):
-        select = discord.ui.Select(
-            placeholder="Choose a position to roll",
-            options=[discord.SelectOption(label=option['label'], value=str(i)) for i, option in enumerate(options)]
-        )
-
-        async def select_callback(select_interaction: discord.Interaction):
-            option_id = int(select_interaction.data["values"][0])
-            selected_option = options[option_id]
-            await self.show_form(select_interaction, selected_option)
+        } for pos in positions)
 
-        select.callback = select_callback
-        view = discord.ui.View()
-        view.add_item(select)
-        
+    async def show_selection(self, interaction: discord.Interaction, options: Iterable[Dict[str, Any]]):
+        options, select_options = self.build_select_options(options)
+        view = PaginatedSelectView(self.show_form, options, select_options, placeholder="Choose a position to roll")
         await interaction.response.send_message("Please select a position to roll:", view=view)
 
     async def show_form(self, interaction: discord.Interaction, selected_option: Dict[str, Any]):
-        if selected_option['value']['Type'] in ['Put', 'Call']:
-            modal = RollOptionModal(selected_option['value'])
+        if selected_option['value'].type in ['Put', 'Call']:
+            modal = RollOptionModal(self, selected_option['value'])
         else:
-            modal = RollStockModal(selected_option['value'])
+            modal = RollStockModal(self, selected_option['value'])
         await interaction.response.send_modal(modal)
 
     async def process_form(self, interaction: discord.Interaction, form_data: Dict[str, Any]):
         position = form_data['position']
         
-        if position['Type'] in ['Put', 'Call']:
+        if position.type in ['Put', 'Call']:
             close_transaction = {
-                'Acct': position['Acct'],
-                'Ticker': position['Ticker'],
-                'Currency': position['Currency'],
-                'Margin %': position['Margin %'],
+                'Acct': position.acct,
+                'Ticker': position.ticker,
+                'Currency': position.currency,
+                'Margin %': position.margin,
                 'Date': form_data['date'],
-                'Trans Type': position['Type'],
-                'Shares': format_number(-float(position['Shares'])),
-                'Strike/Price': position['Strike/Price'],
-                'Expiry': position['Expiry'],
-                'Net Gains': format_number(-float(form_data['cost_to_close'])),
+                'Trans Type': position.type,
+                'Shares': _fmt_qty(-position.shares),
+                'Strike/Price': position.strike_price,
+                'Expiry': position.expiry,
+                'Net Gains': _fmt_qty(-form_data['cost_to_close']),
                 'Notes': 'Closing for roll'
             }
             
             new_transaction = {
-                'Acct': position['Acct'],
-                'Ticker': position['Ticker'],
-                'Currency': position['Currency'],
-                'Margin %': position['Margin %'],
+                'Acct': position.acct,
+                'Ticker': position.ticker,
+                'Currency': position.currency,
+                'Margin %': position.margin,
                 'Date': form_data['date'],
-                'Trans Type': position['Type'],
-                'Shares': position['Shares'],
-                'Strike/Price': format_number(form_data['new_strike']),
+                'Trans Type': position.type,
+                'Shares': _fmt_qty(position.shares),
+                'Strike/Price': _fmt_qty(form_data['new_strike']),
                 'Expiry': form_data['new_expiry'],
-                'Net Gains': format_number(float(form_data['new_proceeds'])),
+                'Net Gains': _fmt_qty(form_data['new_proceeds']),
                 'Notes': 'New position from roll'
             }
         else:  # Stock
-            current_notional = abs(parse_currency(position['Net Gains']))
+            current_notional = abs(position.net_gains_raw)
             close_transaction = {
-                'Acct': position['Acct'],
-                'Ticker': position['Ticker'],
-                'Currency': position['Currency'],
-                'Margin %': position['Margin %'],
+                **_STOCK_ROW,
+                'Acct': position.acct,
+                'Ticker': position.ticker,
+                'Currency': position.currency,
+                'Margin %': position.margin,
                 'Date': form_data['date'],
-                'Trans Type': 'Stk',
-                'Shares': format_number(-float(position['Shares'])),
-                'Strike/Price': '0',
-                'Expiry': '9999-12-31',
-                'Net Gains': format_number(current_notional),  # Positive value
+                'Shares': _fmt_qty(-position.shares),
+                'Net Gains': _fmt_qty(current_notional),  # Positive value
                 'Notes': 'Closing stock for roll'
             }
             
-            new_net_gains = float(form_data['sale_proceeds']) - current_notional + float(form_data['new_proceeds'])
+            new_net_gains = form_data['sale_proceeds'] - current_notional + form_data['new_proceeds']
             new_transaction = {
-                'Acct': position['Acct'],
-                'Ticker': position['Ticker'],
-                'Currency': position['Currency'],
-                'Margin %': position['Margin %'],
+                'Acct': position.acct,
+                'Ticker': position.ticker,
+                'Currency': position.currency,
+                'Margin %': position.margin,
                 'Date': form_data['date'],
                 'Trans Type': 'Put',
-                'Shares': position['Shares'],
-                'Strike/Price': format_number(form_data['new_strike']),
+                'Shares': _fmt_qty(position.shares),
+                'Strike/Price': _fmt_qty(form_data['new_strike']),
                 'Expiry': form_data['new_expiry'],
-                'Net Gains': format_number(new_net_gains),
+                'Net Gains': _fmt_qty(new_net_gains),
                 'Notes': 'New put from stock roll'
             }
         
         return [close_transaction, new_transaction]
 
 class RollOptionModal(discord.ui.Modal):
-    def __init__(self, position: Dict[str, Any]):
-        super().__init__(title=f"Roll {position['Type']}: {position['Ticker']}")
+    def __init__(self, handler: RollPositionHandler, position: Position):
+        super().__init__(title=f"Roll {position.type}: {position.ticker}")
+        self.handler = handler
         self.position = position
 
         self.add_item(discord.ui.TextInput(
             label="Transaction Date (YYYY-MM-DD)", 
-            default=datetime.now().strftime('%Y-%m-%d')
+            default=today_str()
         ))
         self.add_item(discord.ui.TextInput(
             label="New Strike",
@@ -802,24 +926,24 @@ class RollOptionModal(discord.ui.Modal):
                 'new_proceeds': float(self.children[4].value)
             }
             
-            handler = RollPositionHandler(interaction.client.mz_data)
-            transactions = await handler.process_form(interaction, form_data)
+            transactions = await self.handler.process_form(interaction, form_data)
             transactions_display = "\n\n".join([format_transaction_display(t) for t in transactions])
             await interaction.followup.send(
                 f"New transaction(s) to be added:\n```\n{transactions_display}\n```\nDo you want to add these transactions?",
-                view=ConfirmView(transactions)
+                view=ConfirmView(self.handler.mz_data, transactions)
             )
         except ValueError as e:
             await interaction.followup.send(f"Error in input: {str(e)}", ephemeral=True)
 
 class RollStockModal(discord.ui.Modal):
-    def __init__(self, position: Dict[str, Any]):
-        super().__init__(title=f"Roll Stock: {position['Ticker']}")
+    def __init__(self, handler: RollPositionHandler, position: Position):
+        super().__init__(title=f"Roll Stock: {position.ticker}")
+        self.handler = handler
         self.position = position
 
         self.add_item(discord.ui.TextInput(
             label="Transaction Date (YYYY-MM-DD)", 
-            default=datetime.now().strftime('%Y-%m-%d')
+            default=today_str()
         ))
         self.add_item(discord.ui.TextInput(
             label="New Strike",
@@ -850,23 +974,25 @@ class RollStockModal(discord.ui.Modal):
                 'new_proceeds': float(self.children[4].value)
             }
             
-            handler = RollPositionHandler(interaction.client.mz_data)
-            transactions = await handler.process_form(interaction, form_data)
+            transactions = await self.handler.process_form(interaction, form_data)
             transactions_display = "\n\n".join([format_transaction_display(t) for t in transactions])
             await interaction.followup.send(
                 f"New transaction(s) to be added:\n```\n{transactions_display}\n```\nDo you want to add these transactions?",
-                view=ConfirmView(transactions)
+                view=ConfirmView(self.handler.mz_data, transactions)
             )
         except ValueError as e:
             await interaction.followup.send(f"Error in input: {str(e)}", ephemeral=True)
 
 # InterestPaymentHandler Class and Modal
 class InterestPaymentHandler(TradeHandler):
+    __slots__ = ()
+
     async def handle(self, interaction: discord.Interaction):
         await self.show_form(interaction)
 
     async def show_form(self, interaction: discord.Interaction):
-        modal = InterestPaymentModal(self.mz_data)
+        default_account = await get_last_account(self.mz_data.csv_path)
+        modal = InterestPaymentModal(self, default_account)
         await interaction.response.send_modal(modal)
 
     async def process_form(self, interaction: discord.Interaction, form_data: Dict[str, Any]):
@@ -875,35 +1001,32 @@ class InterestPaymentHandler(TradeHandler):
             raise ValueError(f"Invalid account: {form_data['account']}")
 
         # Validate currency
-        if form_data['currency'] not in ['CAD', 'USD']:
+        if form_data['currency'] not in _VALID_CURRENCIES:
             raise ValueError(f"Invalid currency: {form_data['currency']}")
 
         transaction = {
+            **_NO_CONTRACT_ROW,
             'Acct': form_data['account'],
             'Ticker': 'Other',
             'Currency': form_data['currency'],
             'Margin %': '0',
             'Date': form_data['date'],
             'Trans Type': 'Int / Tax',
-            'Shares': '0',
-            'Strike/Price': '0',
-            'Expiry': '9999-12-31',
-            'Net Gains': format_number(form_data['amount']),  # Negative amount for payment
+            'Net Gains': _fmt_qty(form_data['amount']),  # Negative amount for payment
             'Notes': 'Operational Loss - Interest Payments from Negative Balances'
         }
         return [transaction]
 
 class InterestPaymentModal(discord.ui.Modal):
-    def __init__(self, mz_data: TransactionData):
+    def __init__(self, handler: InterestPaymentHandler, default_account: Optional[str] = None):
         super().__init__(title="Interest Payment Transaction")
-        self.mz_data = mz_data
+        self.handler = handler
 
         self.add_item(discord.ui.TextInput(
             label="Transaction Date (YYYY-MM-DD)",
-            default=datetime.now().strftime('%Y-%m-%d')
+            default=today_str()
         ))
 
-        default_account = self.get_last_account()
         self.add_item(discord.ui.TextInput(
             label="Account",
             placeholder="Enter account name",
@@ -920,48 +1043,36 @@ class InterestPaymentModal(discord.ui.Modal):
             placeholder="e.g. 50.25"
         ))
 
-    def get_last_account(self):
-        try:
-            with open(self.mz_data.csv_path, 'r', newline='', encoding='utf-8-sig') as csvfile:
-                reader = csv.DictReader(csvfile)
-                last_row = None
-                for row in reader:
-                    last_row = row
-                return last_row['Acct'] if last_row else None
-        except Exception as e:
-            logging.error(f"Error reading CSV file: {str(e)}")
-            return None
-
     async def on_submit(self, interaction: discord.Interaction):
         try:
             form_data = {
                 'date': self.children[0].value,
                 'account': self.children[1].value,
                 'currency': self.children[2].value.upper(),
-                'amount': float(self.children[3].value.replace('$', '').replace(',', ''))
+                'amount': float(self.children[3].value.translate(_NUMBER_STRIP))
             }
             
-            handler = InterestPaymentHandler(interaction.client.mz_data)
-            transactions = await handler.process_form(interaction, form_data)
+            transactions = await self.handler.process_form(interaction, form_data)
             transactions_display = "\n\n".join([format_transaction_display(t) for t in transactions])
             await interaction.response.send_message(
                 f"New transaction(s) to be added:\n```\n{transactions_display}\n```\nDo you want to add these transactions?",
-                view=ConfirmView(transactions)
+                view=ConfirmView(self.handler.mz_data, transactions)
             )
         except ValueError as e:
             await interaction.response.send_message(f"Error in input: {str(e)}", ephemeral=True)
 
 # ConfirmView class
 class ConfirmView(discord.ui.View):
-    def __init__(self, transactions: List[Dict[str, Any]]):
+    def __init__(self, mz_data: TransactionData, transactions: List[Dict[str, Any]]):
         super().__init__()
+        self.mz_data = mz_data
         self.transactions = transactions
 
     @discord.ui.button(label="Confirm", style=discord.ButtonStyle.green)
     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-        for transaction in self.transactions:
-            append_transaction(interaction.client.mz_data.csv_path, transaction)
-            interaction.client.mz_data.process_transaction(transaction)
+        mz_data = self.mz_data
+        await asyncio.to_thread(append_transactions, mz_data.csv_path, self.transactions)
+        mz_data.process_transactions(self.transactions)
         await interaction.response.send_message("Transaction(s) added successfully.")
         self.stop()
 
@@ -970,97 +1081,111 @@ class ConfirmView(discord.ui.View):
         await interaction.response.send_message("Transaction(s) cancelled.")
         self.stop()
 
-def get_outstanding_positions(mz_data: TransactionData) -> List[Dict[str, Any]]:
+def get_outstanding_positions(mz_data: TransactionData) -> List[Position]:
+    version = mz_data.version
+    cached = _positions_cache.get(mz_data)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
     outstanding_positions = []
+    latest_balances = mz_data.latest_balances
+    open_position_keys = mz_data.open_position_keys
     
-    for key, value in mz_data.daily_balances['opt_positions'].items():
-        if value[max(value.keys())] != 0:
-            outstanding_positions.append({
-                'Acct': key[0],
-                'Ticker': key[3],
-                'Currency': key[1],
-                'Margin %': key[2],
-                'Type': key[4],
-                'Shares': value[max(value.keys())],
-                'Strike/Price': key[5],
-                'Expiry': key[6]
-            })
+    for key in open_position_keys['opt_positions']:
+        _, latest_shares = latest_balances['opt_positions'][key]
+        outstanding_positions.append(Position(
+            acct=key[0],
+            ticker=key[3],
+            currency=key[1],
+            margin=key[2],
+            type=key[4],
+            shares=latest_shares,
+            strike_price=key[5],
+            expiry=key[6]
+        ))
     
-    for key, value in mz_data.daily_balances['stk_shares'].items():
-        if value[max(value.keys())] != 0:
-            notional_key = key
-            if notional_key in mz_data.daily_balances['stk_notional']:
-                notional_value = mz_data.daily_balances['stk_notional'][notional_key]
-                latest_notional = notional_value[max(notional_value.keys())]
-                latest_notional = parse_number(str(latest_notional))
-            else:
-                latest_notional = 0
-
-            outstanding_positions.append({
-                'Acct': key[0],
-                'Ticker': key[3],
-                'Currency': key[1],
-                'Margin %': key[2],
-                'Type': 'Stk',
-                'Shares': value[max(value.keys())],
-                'Strike/Price': '0',
-                'Expiry': '9999-12-31',
-                'Net Gains': format_number(latest_notional, is_currency=True)
-            })
+    for key in open_position_keys['stk_shares']:
+        _, latest_shares = latest_balances['stk_shares'][key]
+        if key in latest_balances['stk_notional']:
+            _, latest_notional = latest_balances['stk_notional'][key]
+        else:
+            latest_notional = 0
+
+        outstanding_positions.append(Position(
+            acct=key[0],
+            ticker=key[3],
+            currency=key[1],
+            margin=key[2],
+            type='Stk',
+            shares=latest_shares,
+            strike_price='0',
+            expiry='9999-12-31',
+            net_gains_raw=latest_notional
+        ))
     
+    _positions_cache[mz_data] = (version, outstanding_positions)
     return outstanding_positions
 
-def create_option_closing_transaction(position: Dict[str, Any], date: datetime, shares: int, closing_costs: float, notes: str) -> Dict[str, Any]:
+def create_option_closing_transaction(position: Position, date_str: str, shares: int, closing_costs: float, notes: str) -> Dict[str, Any]:
     return {
-        'Acct': position['Acct'],
-        'Ticker': position['Ticker'],
-        'Currency': position['Currency'],
-        'Margin %': position['Margin %'],
-        'Date': date.strftime('%Y-%m-%d'),
-        'Trans Type': position['Type'],
-        'Shares': format_number(-shares),
-        'Strike/Price': format_number(position['Strike/Price']),
-        'Expiry': position['Expiry'],
-        'Net Gains': format_number(-closing_costs, is_currency=True),
+        'Acct': position.acct,
+        'Ticker': position.ticker,
+        'Currency': position.currency,
+        'Margin %': position.margin,
+        'Date': date_str,
+        'Trans Type': position.type,
+        'Shares': _fmt_qty(-shares),
+        'Strike/Price': _fmt_qty(float(position.strike_price)),
+        'Expiry': position.expiry,
+        'Net Gains': _fmt_currency(-closing_costs),
         'Notes': notes
     }
 
-def create_stock_closing_transactions(position: Dict[str, Any], date: datetime, shares: int, closing_gains: float, notes: str) -> List[Dict[str, Any]]:
-    total_shares = abs(float(position['Shares']))
-    total_notional = abs(parse_number(position['Net Gains']))
+def create_stock_closing_transactions(position: Position, date_str: str, shares: int, closing_gains: float, notes: str) -> List[Dict[str, Any]]:
+    total_shares = abs(position.shares)
+    total_notional = abs(position.net_gains_raw)
     proportion = shares / total_shares
     proportional_notional = total_notional * proportion
 
     closing_transaction = {
-        'Acct': position['Acct'],
-        'Ticker': position['Ticker'],
-        'Currency': position['Currency'],
-        'Margin %': position['Margin %'],
-        'Date': date.strftime('%Y-%m-%d'),
-        'Trans Type': 'Stk',
-        'Shares': format_number(-shares),
-        'Strike/Price': '0',
-        'Expiry': '9999-12-31',
-        'Net Gains': format_number(proportional_notional, is_currency=True),
+        **_STOCK_ROW,
+        'Acct': position.acct,
+        'Ticker': position.ticker,
+        'Currency': position.currency,
+        'Margin %': position.margin,
+        'Date': date_str,
+        'Shares': _fmt_qty(-shares),
+        'Net Gains': _fmt_currency(proportional_notional),
         'Notes': notes
     }
     
     capital_gains_transaction = {
-        'Acct': position['Acct'],
-        'Ticker': position['Ticker'],
-        'Currency': position['Currency'],
-        'Margin %': position['Margin %'],
-        'Date': date.strftime('%Y-%m-%d'),
+        **_NO_CONTRACT_ROW,
+        'Acct': position.acct,
+        'Ticker': position.ticker,
+        'Currency': position.currency,
+        'Margin %': position.margin,
+        'Date': date_str,
         'Trans Type': 'Cap Gains',
-        'Shares': '0',
-        'Strike/Price': '0',
-        'Expiry': '9999-12-31',
-        'Net Gains': format_number(float(closing_gains) - proportional_notional, is_currency=True),
+        'Net Gains': _fmt_currency(closing_gains - proportional_notional),
         'Notes': ''
     }
     
     return [closing_transaction, capital_gains_transaction]
 
+# Display labels for the CSV columns, used by format_transaction_display
+HEADER_MAPPING = {
+    "Acct": "Account", "Ticker": "Ticker", "Currency": "Currency",
+    "Margin %": "Margin %", "Date": "Date", "Trans Type": "Transaction Type",
+    "Shares": "Shares", "Strike/Price": "Strike/Price", "Expiry": "Expiry",
+    "Net Gains": "Net Gains", "Notes": "Notes"
+}
+_MAX_HEADER_LENGTH = max(len(label) for label in HEADER_MAPPING.values())
+# Padded "Label : " prefix of each standard column
+_HEADER_PREFIXES = {key: f"{label.ljust(_MAX_HEADER_LENGTH)} : " for key, label in HEADER_MAPPING.items()}
+# Columns shown as currency amounts
+_CURRENCY_COLUMNS = frozenset(('Net Gains', 'Strike/Price'))
+
 def format_transaction_display(transactions: Union[Dict[str, Any], List[Dict[str, Any]]]) -> str:
     if isinstance(transactions, dict):
         transactions = [transactions]
@@ -1068,53 +1193,37 @@ def format_transaction_display(transactions: Union[Dict[str, Any], List[Dict[str
     formatted_transactions = []
     
     for transaction in transactions:
-        header_mapping = {
-            "Acct": "Account", "Ticker": "Ticker", "Currency": "Currency",
-            "Margin %": "Margin %", "Date": "Date", "Trans Type": "Transaction Type",
-            "Shares": "Shares", "Strike/Price": "Strike/Price", "Expiry": "Expiry",
-            "Net Gains": "Net Gains", "Notes": "Notes"
-        }
-        
-        # Handle potential BOM in the first key
-        first_key = next(iter(transaction.keys()))
-        if first_key.startswith('\ufeff'):
-            transaction[first_key[1:]] = transaction.pop(first_key)
-        
         lines = []
-        max_key_length = max(len(header_mapping.get(key, key)) for key in transaction.keys())
+        if transaction.keys() == HEADER_MAPPING.keys():
+            prefixes = _HEADER_PREFIXES
+        else:
+            max_key_length = max(len(HEADER_MAPPING.get(key, key)) for key in transaction.keys())
+            prefixes = {key: f"{HEADER_MAPPING.get(key, key).ljust(max_key_length)} : " for key in transaction}
         
         for key, value in transaction.items():
-            formatted_key = header_mapping.get(key, key)
-            if key in ['Net Gains', 'Strike/Price']:
+            if key in _CURRENCY_COLUMNS:
                 try:
-                    numeric_value = float(value.replace('$', '').replace(',', ''))
+                    numeric_value = float(value.translate(_NUMBER_STRIP))
                     formatted_value = f"${numeric_value:,.2f}"
                 except ValueError:
                     formatted_value = value
             else:
                 formatted_value = value
             
-            lines.append(f"{formatted_key:<{max_key_length}} : {formatted_value}")
+            lines.append(f"{prefixes[key]}{formatted_value}")
         
         formatted_transactions.append("\n".join(lines))
     
     return "\n\n".join(formatted_transactions)
 
-def append_transaction(csv_path: str, transaction: Dict[str, Any]):
-    fieldnames = [
-        "Acct", "Ticker", "Currency", "Margin %", "Date", "Trans Type",
-        "Shares", "Strike/Price", "Expiry", "Net Gains", "Notes"
-    ]
-
-    with open(csv_path, 'a', newline='', encoding='utf-8-sig') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        
-        if csvfile.tell() == 0:
-            writer.writeheader()
-        
-        writer.writerow(transaction)
-
-    print(f"Transaction appended to {csv_path}")
+async def get_last_account(csv_path: str) -> Optional[str]:
+    """Account of the last transaction in the CSV, read off the event loop."""
+    try:
+        last_row = await asyncio.to_thread(read_last_transaction, csv_path)
+        return last_row['Acct'] if last_row else None
+    except Exception as e:
+        logging.error(f"Error reading CSV file: {str(e)}")
+        return None
 
 async def process_add_trade(interaction: discord.Interaction, mz_data: TransactionData, acct: str, ticker: str, shares: int, currency: str):
     handler = AddTradeHandler(mz_data, acct, ticker, shares, currency)
@@ -1,28 +1,9 @@
-import csv
 import os
 from datetime import datetime
 from tabulate import tabulate
+from transaction_csv import append_transaction, append_transactions, read_last_transactions
 
-def append_transaction(csv_path, transaction_data):
-    """
-    Append a new transaction to the CSV file.
-    
-    :param csv_path: Path to the CSV file
-    :param transaction_data: Dictionary containing transaction details
-    """
-    headers = ["Acct", "Ticker", "Currency", "Margin %", "Date", "Trans Type", 
-               "Shares", "Strike/Price", "Expiry", "Net Gains", "Notes"]
-    
-    # Check if file exists, if not create it with headers
-    file_exists = os.path.isfile(csv_path)
-    
-    with open(csv_path, 'a', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=headers)
-        
-        if not file_exists:
-            writer.writeheader()
-        
-        writer.writerow(transaction_data)
+__all__ = ['append_transaction', 'append_transactions', 'display_last_trades']
 
 def display_last_trades(csv_path, num_trades=3):
     """
@@ -35,13 +16,11 @@ def display_last_trades(csv_path, num_trades=3):
     if not os.path.exists(csv_path):
         return "CSV file not found."
 
-    with open(csv_path, 'r', encoding='utf-8-sig') as csvfile:
-        reader = csv.DictReader(csvfile)
-        fieldnames = reader.fieldnames
-        if not fieldnames:
-            return "CSV file is empty or has no headers."
-        
-        trades = list(reader)[-num_trades:]
+    found = read_last_transactions(csv_path, num_trades)
+    if found is None:
+        return "CSV file is empty or has no headers."
+    
+    fieldnames, trades = found
 
     if not trades:
         return "No trades found."
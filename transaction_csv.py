@@ -0,0 +1,127 @@
+import csv
+import io
+import logging
+import os
+import re
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Column order of the transactions CSV
+FIELDNAMES = [
+    "Acct", "Ticker", "Currency", "Margin %", "Date", "Trans Type",
+    "Shares", "Strike/Price", "Expiry", "Net Gains", "Notes"
+]
+# Pulls a transaction dict's values out in FIELDNAMES order
+_row_values = itemgetter(*FIELDNAMES)
+# Characters that make csv.writer quote a field (default dialect)
+_CSV_SPECIAL = re.compile(r'[,"\r\n]')
+
+# Bytes read from the end of the CSV when looking for its last rows (doubled until they fit)
+_TAIL_WINDOW = 8192
+
+def _encode_rows(rows: Iterable[Iterable[Any]]) -> str:
+    """Render rows as CSV text; only rows with values that need quoting go through csv.writer."""
+    lines = []
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        if all(type(value) is str for value in row) and not _CSV_SPECIAL.search(''.join(row)):
+            lines.append(','.join(row) + '\r\n')
+        else:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(row)
+            lines.append(buffer.getvalue())
+    return ''.join(lines)
+
+def append_transactions(csv_path: str, transactions: List[Dict[str, Any]]):
+    rows = map(_row_values, transactions)
+    with open(csv_path, 'a', newline='', encoding='utf-8-sig') as csvfile:
+        if csvfile.tell() == 0:
+            csvfile.write(_encode_rows([FIELDNAMES]))
+        csvfile.write(_encode_rows(rows))
+
+    logging.debug(f"{len(transactions)} transaction(s) appended to {csv_path}")
+
+def append_transaction(csv_path: str, transaction: Dict[str, Any]):
+    append_transactions(csv_path, [transaction])
+
+def _row_starts(tail: bytes, at_data_start: bool) -> List[int]:
+    """Offsets of the non-blank rows that begin in tail, the bytes up to the end of the CSV.
+
+    The file ends outside quotes, so a newline ends a row when an even number of quotes
+    follow it; the bytes before the first such newline are part of an earlier row unless
+    tail starts right after the header.
+    """
+    boundaries = []
+    quotes = 0
+    end = len(tail)
+    while True:
+        newline = tail.rfind(b'\n', 0, end)
+        if newline == -1:
+            break
+        quotes += tail.count(b'"', newline + 1, end)
+        if quotes % 2 == 0:
+            boundaries.append(newline + 1)
+        end = newline
+    if at_data_start:
+        boundaries.append(0)
+    boundaries.reverse()
+    return [row_start for row_start, row_end in zip(boundaries, boundaries[1:] + [len(tail)])
+            if tail[row_start:row_end].strip(b'\r\n')]
+
+def _find_last_rows(csvfile, count: int) -> Optional[Tuple[List[str], List[Tuple[List[str], int]]]]:
+    """Locate the last count rows of a transactions CSV opened in binary mode.
+
+    Returns the header and each row with the byte offset it starts at, oldest first.
+    """
+    header = next(csv.reader([csvfile.readline().decode('utf-8-sig').lstrip('\ufeff')]), None)
+    if not header:
+        return None
+    data_start = csvfile.tell()
+    size = csvfile.seek(0, os.SEEK_END)
+
+    window = _TAIL_WINDOW
+    while True:
+        start = max(data_start, size - window)
+        csvfile.seek(start)
+        tail = csvfile.read(size - start)
+        starts = _row_starts(tail, start == data_start)
+        if len(starts) >= count or start == data_start:
+            break
+        window *= 2
+
+    starts = starts[-count:]
+    rows = []
+    for row_start, row_end in zip(starts, starts[1:] + [len(tail)]):
+        row_text = tail[row_start:row_end].decode('utf-8')
+        rows.append((next(csv.reader(io.StringIO(row_text, newline=None))), start + row_start))
+    return header, rows
+
+def _row_to_dict(header: List[str], row: List[str]) -> Dict[str, str]:
+    return dict(zip(header, row + [None] * (len(header) - len(row))))
+
+def read_last_transactions(csv_path: str, count: int) -> Optional[Tuple[List[str], List[Dict[str, str]]]]:
+    """Return the header and last count rows of the transactions CSV, reading only the end when that is safe."""
+    with open(csv_path, 'rb') as csvfile:
+        found = _find_last_rows(csvfile, count)
+    if found is None:
+        return None
+    header, rows = found
+    return header, [_row_to_dict(header, row) for row, _ in rows]
+
+def read_last_transaction(csv_path: str) -> Optional[Dict[str, str]]:
+    """Return the last row of the transactions CSV."""
+    found = read_last_transactions(csv_path, 1)
+    return found[1][-1] if found and found[1] else None
+
+def delete_last_transaction(csv_path: str, expected: Dict[str, str]) -> None:
+    """Remove the last row of the transactions CSV by truncating the file in place."""
+    with open(csv_path, 'rb+') as csvfile:
+        found = _find_last_rows(csvfile, 1)
+        if found is None or not found[1]:
+            raise ValueError("No trades found to delete")
+        header, [(row, offset)] = found
+        if _row_to_dict(header, row) != expected:
+            raise ValueError("The last trade changed since it was displayed")
+        csvfile.truncate(offset)
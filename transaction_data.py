@@ -1,121 +1,357 @@
 import csv
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 from collections import defaultdict
 import logging
-from typing import List, Dict, Tuple, Union, Optional, Any
+from typing import List, Dict, Tuple, Union, Optional, Any, Iterable
 from functools import lru_cache
-import requests
 import io
+import pickle
+import hashlib
+import numpy as np
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Parsed state is saved next to the CSV so a restart only has to parse rows added since
+SNAPSHOT_SUFFIX = '.cache.pkl'
+# Bump whenever the layout of the saved state changes
+SNAPSHOT_FORMAT = 3
+
+# Position in the balance keys of each type of the fields that queries can filter on
+_POSITION_FIELDS = {'account': 0, 'currency': 1, 'margin': 2, 'tickers': 3}
+_FILTER_POSITIONS = {
+    'investments': {'account': 0, 'currency': 1, 'investment_type': 2},
+    'revenue': {'account': 0, 'currency': 1, 'tickers': 2},
+    'opt_positions': _POSITION_FIELDS,
+    'opt_notional': _POSITION_FIELDS,
+    'stk_shares': _POSITION_FIELDS,
+    'stk_notional': _POSITION_FIELDS,
+    'cash_balances': {'account': 0, 'currency': 1}
+}
+
+# Placeholders for a zero amount, and the symbols dropped from amounts before parsing
+_ZERO_AMOUNTS = frozenset(('-', '', '$-'))
+_AMOUNT_STRIP = str.maketrans('', '', '$€£,')
+
+@lru_cache(maxsize=None)
+def _investment_type(notes: str) -> Optional[str]:
+    """Investment bucket the notes of a cash transaction put it in, if any; notes repeat across rows."""
+    notes = notes.lower()
+    if 'invest' in notes and 'pre convert' in notes:
+        return 'regular'
+    elif 'margin cover' in notes or 'short term juicing' in notes:
+        return 'temp'
+    elif 'personal withdraw' in notes:
+        return 'regular'
+    return None
+
+def _rows_as_dicts(reader: Iterable[List[str]], fieldnames: List[str]) -> Iterable[Dict[str, Any]]:
+    """Rows of a csv.reader as dicts, built the way csv.DictReader builds them."""
+    width = len(fieldnames)
+    for row in reader:
+        if len(row) == width:
+            yield dict(zip(fieldnames, row))
+        elif row:
+            # Extra values go under None and missing ones are None, as in DictReader
+            transaction = dict(zip(fieldnames, row))
+            if len(row) > width:
+                transaction[None] = row[width:]
+            else:
+                for key in fieldnames[len(row):]:
+                    transaction[key] = None
+            yield transaction
 
 class TransactionData:
     def __init__(self, csv_path=None, LOCLimit=0, LOCUsage=0):
         self.transactions: List[Dict[str, str]] = []
-        self.daily_balances: Dict[str, Dict[Tuple[str, ...], Dict[datetime, float]]] = {
-            'investments': defaultdict(lambda: defaultdict(float)),
-            'revenue': defaultdict(lambda: defaultdict(float)),
-            'opt_positions': defaultdict(lambda: defaultdict(float)),
-            'opt_notional': defaultdict(lambda: defaultdict(float)),
-            'stk_shares': defaultdict(lambda: defaultdict(float)),
-            'stk_notional': defaultdict(lambda: defaultdict(float)),
-            'cash_balances': defaultdict(lambda: defaultdict(float))            
+        # Events of every key as parallel (dates, deltas) columns in the order they were processed;
+        # the balance on a day is the sum of the deltas dated on or before it
+        self.daily_balances: Dict[str, Dict[Tuple[str, ...], Tuple[List[datetime], List[float]]]] = {
+            'investments': {},
+            'revenue': {},
+            'opt_positions': {},
+            'opt_notional': {},
+            'stk_shares': {},
+            'stk_notional': {},
+            'cash_balances': {}
+        }
+        # Per balance type: (key position, value) -> {key: order the key was first seen in}
+        self._key_index: Dict[str, Dict[Tuple[int, str], Dict[Tuple, int]]] = {}
+        self._build_key_index()
+        # (balance type, key) -> sorted event days and the balance at the end of each, built on lookup
+        self._materialized: Dict[Tuple[str, Tuple], Tuple[np.ndarray, np.ndarray]] = {}
+        # (latest event date, balance after all events) of every key, kept in step with daily_balances
+        self.latest_balances: Dict[str, Dict[Tuple[str, ...], Tuple[datetime, float]]] = {
+            balance_type: {} for balance_type in self.daily_balances
+        }
+        # Keys whose latest balance is non-zero; dicts used as insertion-ordered sets
+        self.open_position_keys: Dict[str, Dict[Tuple[str, ...], None]] = {
+            'opt_positions': {},
+            'stk_shares': {}
         }
         self.first_transaction_date: Union[datetime, None] = None
         self.last_update: Union[datetime, None] = None
         self.csv_path = csv_path
         self.LOCLimit = LOCLimit
         self.LOCUsage = LOCUsage
+        # CSV header, reused when parsing resumes part way through the file
+        self._fieldnames: Optional[List[str]] = None
+        # Bumped whenever transactions are processed; caches built from the balances key on it
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """Changes whenever the transactions change, so results built from them can be cached against it."""
+        return self._version
+
+    def reload(self) -> None:
+        """Rebuild the state from the CSV, for when rows were removed from it."""
+        # Parsed into a separate instance so readers keep the old state until the new one is complete
+        fresh = TransactionData(self.csv_path, self.LOCLimit, self.LOCUsage)
+        fresh.process_csv()
+        fresh._version = self._version + 1
+        self.__dict__.update(fresh.__dict__)
+        self.clear_cache()
 
     def process_csv(self):
         if not os.path.exists(self.csv_path):
-            print(f"CSV file not found: {self.csv_path}")
+            logging.warning(f"CSV file not found: {self.csv_path}")
             return
 
-        with open(self.csv_path, 'r', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)            
-            
-            for row in reader:                
-                self.process_transaction(row)
+        with open(self.csv_path, 'rb') as csvfile:
+            data = csvfile.read()
+
+        # Resume after the rows covered by a saved snapshot when the file still starts with them
+        start = self._load_snapshot(data) if not self.transactions else 0
+        if start < len(data):
+            text = data[start:].decode('utf-8-sig' if start == 0 else 'utf-8')
+            reader = csv.reader(io.StringIO(text, newline=None))
+            fieldnames = self._fieldnames if start else next(reader, None)
+            # utf-8-sig drops the file's BOM; strip any left on the header so rows need no check
+            if fieldnames and fieldnames[0].startswith('\ufeff'):
+                fieldnames = [fieldnames[0].lstrip('\ufeff'), *fieldnames[1:]]
+            self.process_transactions(_rows_as_dicts(reader, fieldnames or []))
+            self._fieldnames = fieldnames
+            self._save_snapshot(data)
         
         self.last_update = datetime.now()
 
-        print("\nAccounts:", self.get_accounts())
-        print("Currencies:", self.get_currencies())
-        print("Tickers:", self.get_tickers())
+        logging.info(f"Loaded {len(self.transactions)} transactions from {self.csv_path}; "
+                     f"accounts: {self.get_accounts()}, currencies: {self.get_currencies()}, "
+                     f"tickers: {len(self.get_tickers())}")
 
     def process_transaction(self, transaction: Dict[str, str]) -> None:
-        try:
-            if '\ufeffAcct' in transaction:
-                transaction['Acct'] = transaction.pop('\ufeffAcct')
-            
-            if 'Acct' not in transaction:
-                print(f"Missing 'Acct' key in transaction: {transaction}")
-                return
+        self.process_transactions([transaction])
+
+    def process_transactions(self, transactions: Iterable[Dict[str, str]]) -> None:
+        """Fold a batch of transactions into the balances in a single pass."""
+        # Deltas summed per (balance type, key, date) so each key gets one event per date
+        pending: Dict[Tuple[str, Tuple, datetime], float] = defaultdict(float)
+        # Rows are logged one by one only at debug level; otherwise a single warning counts them
+        failed = 0
+        for transaction in transactions:
+            try:
+                if 'Acct' not in transaction:
+                    logging.debug(f"Missing 'Acct' key in transaction: {transaction}")
+                    failed += 1
+                    continue
 
-            self.transactions.append(transaction)
+                self.transactions.append(transaction)
             
-            date = datetime.strptime(transaction['Date'], '%Y-%m-%d')
-            if self.first_transaction_date is None or date < self.first_transaction_date:
-                self.first_transaction_date = date
+                date = self.parse_date(transaction['Date'])
+                if self.first_transaction_date is None or date < self.first_transaction_date:
+                    self.first_transaction_date = date
             
-            account = transaction['Acct']
-            currency = transaction['Currency']
-            margin = transaction['Margin %']
-            trans_type = transaction['Trans Type']
-            amount = self.parse_amount(transaction['Net Gains'])
-            ticker = transaction['Ticker']
-
-            notes = transaction.get('Notes', '').lower()
-
-            if trans_type == 'Cash':
-                if 'invest' in notes and 'pre convert' in notes:
-                    self.update_daily_balance('investments', (account, currency, 'regular'), date, amount)
-                elif any(item in notes for item in ['margin cover', 'short term juicing']):
-                    self.update_daily_balance('investments', (account, currency, 'temp'), date, amount)
-                elif 'personal withdraw' in notes:
-                    self.update_daily_balance('investments', (account, currency, 'regular'), date, amount)
-
-            self.update_daily_balance('cash_balances', (account, currency), date, amount)
-
-            if trans_type in ['Put', 'Call', 'Cap Gains', 'Div', 'Int / Tax']:
-                self.update_daily_balance('revenue', (account, currency, ticker, trans_type), date, amount)
-
-            if trans_type in ['Put', 'Call']:
-                shares = self.parse_amount(transaction['Shares'])
-                strike_price = self.parse_amount(transaction.get('Strike/Price', '0'))
-                expiry = datetime.strptime(transaction['Expiry'], '%Y-%m-%d')
-                self.update_daily_balance('opt_positions', (account, currency, margin, ticker, trans_type, str(strike_price), expiry.strftime('%Y-%m-%d')), date, shares)
-                self.update_daily_balance('opt_notional', (account, currency, margin, ticker, trans_type, str(strike_price), expiry.strftime('%Y-%m-%d')), date, shares * strike_price)
-
-            if trans_type == 'Stk':
-                shares = self.parse_amount(transaction['Shares'])
-                self.update_daily_balance('stk_shares', (account, currency, margin, ticker), date, shares)
-                self.update_daily_balance('stk_notional', (account, currency, margin, ticker), date, -amount)
-
-        except KeyError as e:
-            print(f"KeyError in transaction: {e}")
-            print(f"Transaction data: {transaction}")
-        except ValueError as e:
-            print(f"ValueError in transaction: {e}")
-            print(f"Transaction data: {transaction}")
+                account = transaction['Acct']
+                currency = transaction['Currency']
+                margin = transaction['Margin %']
+                trans_type = transaction['Trans Type']
+                amount = self.parse_amount(transaction['Net Gains'])
+                ticker = transaction['Ticker']
+
+                if trans_type == 'Cash':
+                    investment_type = _investment_type(transaction.get('Notes') or '')
+                    if investment_type is not None:
+                        pending['investments', (account, currency, investment_type), date] += amount
+
+                pending['cash_balances', (account, currency), date] += amount
+
+                if trans_type in ['Put', 'Call', 'Cap Gains', 'Div', 'Int / Tax']:
+                    pending['revenue', (account, currency, ticker, trans_type), date] += amount
+
+                if trans_type in ['Put', 'Call']:
+                    shares = self.parse_amount(transaction['Shares'])
+                    strike_price = self.parse_amount(transaction.get('Strike/Price', '0'))
+                    expiry = self.format_date(transaction['Expiry'])
+                    pending['opt_positions', (account, currency, margin, ticker, trans_type, str(strike_price), expiry), date] += shares
+                    pending['opt_notional', (account, currency, margin, ticker, trans_type, str(strike_price), expiry), date] += shares * strike_price
+
+                if trans_type == 'Stk':
+                    shares = self.parse_amount(transaction['Shares'])
+                    pending['stk_shares', (account, currency, margin, ticker), date] += shares
+                    pending['stk_notional', (account, currency, margin, ticker), date] -= amount
+
+            except KeyError as e:
+                logging.debug(f"KeyError in transaction: {e}; transaction data: {transaction}")
+                failed += 1
+            except ValueError as e:
+                logging.debug(f"ValueError in transaction: {e}; transaction data: {transaction}")
+                failed += 1
+
+        if failed:
+            logging.warning(f"{failed} transaction(s) could not be fully processed; enable debug logging for details")
+
+        for (balance_type, key, date), amount in pending.items():
+            self.update_daily_balance(balance_type, key, date, amount)
+
+        self._version += 1
+        self.clear_cache()
+
+    def _snapshot_path(self) -> str:
+        return self.csv_path + SNAPSHOT_SUFFIX
+
+    def _save_snapshot(self, data: bytes) -> None:
+        """Save the parsed state for the CSV contents in data."""
+        snapshot = {
+            'format': SNAPSHOT_FORMAT,
+            'size': len(data),
+            'digest': hashlib.sha1(data).hexdigest(),
+            'fieldnames': self._fieldnames,
+            'transactions': self.transactions,
+            'first_transaction_date': self.first_transaction_date,
+            'daily_balances': self.daily_balances,
+            'latest_balances': self.latest_balances,
+            'open_position_keys': self.open_position_keys
+        }
+        path = self._snapshot_path()
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logging.warning(f"Could not save snapshot {path}: {e}")
+
+    def _load_snapshot(self, data: bytes) -> int:
+        """Restore the state saved for a prefix of data; returns the offset to resume parsing at."""
+        path = self._snapshot_path()
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable snapshot {path}: {e}")
+            return 0
+
+        size = snapshot.get('format') == SNAPSHOT_FORMAT and snapshot['size']
+        if not size or size > len(data) or hashlib.sha1(data[:size]).hexdigest() != snapshot['digest']:
+            return 0
+
+        self._fieldnames = snapshot['fieldnames']
+        self.transactions = snapshot['transactions']
+        self.first_transaction_date = snapshot['first_transaction_date']
+        self.daily_balances = snapshot['daily_balances']
+        self._materialized = {}
+        self._build_key_index()
+        self.latest_balances = snapshot['latest_balances']
+        self.open_position_keys = snapshot['open_position_keys']
+        return size
 
     def update_daily_balance(self, balance_type: str, key: Tuple, date: datetime, amount: float) -> None:
-        daily_balance = self.daily_balances[balance_type][key]
-        current_date = datetime.now()
-        for day in (date + timedelta(n) for n in range((current_date - date).days + 1)):
-            daily_balance[day] += amount
+        balances = self.daily_balances[balance_type]
+        events = balances.get(key)
+        if events is None:
+            self._index_key(balance_type, key, len(balances))
+            events = balances[key] = ([], [])
+        dates, amounts = events
+        dates.append(date)
+        amounts.append(amount)
+        self._materialized.pop((balance_type, key), None)
+
+        last_day, latest_balance = self.latest_balances[balance_type].get(key, (date, 0.0))
+        latest_balance += amount
+        self.latest_balances[balance_type][key] = (max(last_day, date), latest_balance)
+
+        open_keys = self.open_position_keys.get(balance_type)
+        if open_keys is not None:
+            if latest_balance != 0:
+                open_keys[key] = None
+            else:
+                open_keys.pop(key, None)
+
+    def _index_key(self, balance_type: str, key: Tuple, order: int) -> None:
+        index = self._key_index[balance_type]
+        for position in _FILTER_POSITIONS[balance_type].values():
+            index.setdefault((position, key[position]), {})[key] = order
+
+    def _build_key_index(self) -> None:
+        self._key_index = {balance_type: {} for balance_type in self.daily_balances}
+        for balance_type, balances in self.daily_balances.items():
+            for order, key in enumerate(balances):
+                self._index_key(balance_type, key, order)
+
+    def _matching_keys(self, balance_type: str, account: Optional[str], currency: Optional[str],
+                       tickers: Optional[List[str]], margin: Optional[str],
+                       investment_type: Optional[str]) -> Iterable[Tuple]:
+        """Keys of balance_type passing the filters, in the order they were first seen."""
+        positions = _FILTER_POSITIONS[balance_type]
+        index = self._key_index[balance_type]
+        buckets = [index.get((positions[name], value), {})
+                   for name, value in (('account', account), ('currency', currency),
+                                       ('margin', margin), ('investment_type', investment_type))
+                   if value is not None and name in positions]
+        if tickers is not None and 'tickers' in positions:
+            buckets.append({key: order for ticker in tickers
+                            for key, order in index.get((positions['tickers'], ticker), {}).items()})
+        if not buckets:
+            return self.daily_balances[balance_type].keys()
+
+        buckets.sort(key=len)
+        smallest, others = buckets[0], buckets[1:]
+        matches = sorted((order, key) for key, order in smallest.items()
+                         if all(key in bucket for bucket in others))
+        return [key for _, key in matches]
+
+    def _materialize(self, balance_type: str, key: Tuple) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the sorted event days of a key and its running balance after each."""
+        materialized = self._materialized.get((balance_type, key))
+        if materialized is None:
+            dates, amounts = self.daily_balances[balance_type][key]
+            days = np.array(dates, dtype='datetime64[D]')
+            order = days.argsort(kind='stable')
+            materialized = (days[order], np.cumsum(np.array(amounts)[order]))
+            self._materialized[balance_type, key] = materialized
+        return materialized
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def parse_date(value: str) -> datetime:
+        # fromisoformat is implemented in C; strptime still handles non-padded dates
+        if len(value) == 10:
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                pass
+        return datetime.strptime(value, '%Y-%m-%d')
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def format_date(value: str) -> str:
+        # Zero-padded form used in position keys; expiry dates repeat across many rows
+        return TransactionData.parse_date(value).strftime('%Y-%m-%d')
 
     @staticmethod
     def parse_amount(value: Union[str, int, float]) -> float:
         if isinstance(value, (int, float)):
             return float(value)
+        # Most amounts are plain numbers, which float() takes as they are
+        try:
+            return float(value)
+        except ValueError:
+            pass
         value = value.strip()
-        if value in ['-', '', '$-', ' $-']:
+        if value in _ZERO_AMOUNTS:
             return 0.0
         try:
-            value = value.replace('$', '').replace('€', '').replace('£', '').replace(',', '')
+            value = value.translate(_AMOUNT_STRIP)
             if value.startswith('(') and value.endswith(')'):
                 return -float(value[1:-1])
             return float(value)
@@ -135,18 +371,21 @@ class TransactionData:
         total_balance = 0
         breakdown: Dict[Tuple, float] = {}
     
-        for key, daily_balance in self.daily_balances[balance_type].items():
-            if date in daily_balance:
-                if self._match_filters(key, balance_type, account, currency, tickers, margin, investment_type):
-                    balance = daily_balance[date]
-                    total_balance += balance
+        day = np.datetime64(date, 'D')
+        for key in self._matching_keys(balance_type, account, currency, tickers, margin, investment_type):
+            days, balances = self._materialize(balance_type, key)
+            # Keys have no balance before their first event
+            i = days.searchsorted(day, side='right') - 1
+            if i >= 0:
+                balance = float(balances[i])
+                total_balance += balance
     
-                    if balance_type == 'investments':
-                        breakdown_key = (key[0], key[1], key[2])
-                    else:
-                        breakdown_key = key
+                if balance_type == 'investments':
+                    breakdown_key = (key[0], key[1], key[2])
+                else:
+                    breakdown_key = key
     
-                    breakdown[breakdown_key] = breakdown.get(breakdown_key, 0) + balance
+                breakdown[breakdown_key] = breakdown.get(breakdown_key, 0) + balance
     
         return total_balance, breakdown
 
@@ -163,55 +402,32 @@ class TransactionData:
         total_sum = 0
         breakdown_sum: Dict[Tuple, float] = {}
         day_count = (end_date - start_date).days + 1
+        start = np.datetime64(start_date, 'D')
+        end = np.datetime64(end_date, 'D') + 1
     
-        current_date = start_date
-        while current_date <= end_date:
-            daily_total, daily_breakdown = self.get_spot_balance(
-                current_date, balance_type, account, currency, tickers, margin, investment_type
-            )
-            
-            total_sum += daily_total
-            
-            for key, value in daily_breakdown.items():
-                breakdown_sum[key] = breakdown_sum.get(key, 0) + value
-    
-            current_date += timedelta(days=1)
+        keys = self._matching_keys(balance_type, account, currency, tickers, margin, investment_type) if start < end else ()
+        for key in keys:
+            days, balances = self._materialize(balance_type, key)
+            # Keys have no balance before their first event
+            if days[0] >= end:
+                continue
+            # Each balance holds from its event day until the next event, clipped to the range
+            spans = (np.minimum(np.append(days[1:], end), end) - np.maximum(days, start)).astype(np.int64)
+            balance_sum = float(np.dot(balances, np.maximum(spans, 0)))
+            total_sum += balance_sum
+
+            if balance_type == 'investments':
+                breakdown_key = (key[0], key[1], key[2])
+            else:
+                breakdown_key = key
+
+            breakdown_sum[breakdown_key] = breakdown_sum.get(breakdown_key, 0) + balance_sum
     
         average_total = total_sum / day_count
         average_breakdown = {key: value / day_count for key, value in breakdown_sum.items()}
     
         return average_total, average_breakdown
 
-    def _match_filters(self, key: Tuple, balance_type: str, account: Optional[str], 
-                       currency: Optional[str], tickers: Optional[List[str]], 
-                       margin: Optional[str], investment_type: Optional[str]) -> bool:
-        if balance_type == 'investments':
-            return (
-                (account is None or key[0] == account) and
-                (currency is None or key[1] == currency) and
-                (investment_type is None or key[2] == investment_type)
-            )
-        elif balance_type in ['opt_positions', 'opt_notional', 'stk_shares', 'stk_notional']:
-            return (
-                (account is None or key[0] == account) and
-                (currency is None or key[1] == currency) and
-                (margin is None or key[2] == margin) and
-                (tickers is None or key[3] in tickers)
-            )
-        elif balance_type == 'revenue':
-            return (
-                (account is None or key[0] == account) and
-                (currency is None or key[1] == currency) and
-                (tickers is None or key[2] in tickers)
-            )
-        elif balance_type == 'cash_balances':
-            return (
-                (account is None or key[0] == account) and
-                (currency is None or key[1] == currency)
-            )
-        else:
-            return False
-    
     @lru_cache(maxsize=None)
     def get_currencies(self) -> List[str]:
         return list(set(key[1] for key in self.daily_balances['cash_balances'].keys()))
@@ -261,6 +477,7 @@ class TransactionData:
 
     def update_cache(self):
         self.clear_cache()
+        self._build_key_index()
         # Force recalculation of cached methods
         self.get_currencies()
         self.get_accounts()
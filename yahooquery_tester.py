@@ -1,4 +1,5 @@
 from yahooquery import Ticker
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import pandas as pd
 
@@ -20,11 +21,18 @@ def get_stock_last_price(tickers):
         tickers = [tickers]  # Convert single ticker to list
     
     results = []
+    if not tickers:
+        return pd.DataFrame(results)
+    
+    # One batched request for every ticker
+    try:
+        prices = Ticker(list(tickers)).price
+    except Exception as e:
+        return pd.DataFrame([{'ticker': ticker_symbol, 'last_price': None, 'error': str(e)} for ticker_symbol in tickers])
     
     for ticker_symbol in tickers:
         try:
-            ticker = Ticker(ticker_symbol)
-            price_data = ticker.price[ticker_symbol]
+            price_data = prices[ticker_symbol]
             
             if 'regularMarketPrice' in price_data:
                 last_price = price_data['regularMarketPrice']
@@ -37,6 +45,27 @@ def get_stock_last_price(tickers):
     
     return pd.DataFrame(results)
 
+def get_option_chains(tickers):
+    """
+    Get the option chains of several tickers with one batched request.
+    
+    :param tickers: list of str, ticker symbols
+    :return: dict mapping each ticker with option data to its option chain DataFrame
+    """
+    unique_tickers = list(dict.fromkeys(tickers))
+    if not unique_tickers:
+        return {}
+    
+    option_data = Ticker(unique_tickers, asynchronous=True).option_chain
+    # Failed requests come back as an error message instead of a DataFrame
+    if not isinstance(option_data, pd.DataFrame) or option_data.empty:
+        return {}
+    
+    if 'symbol' in option_data.index.names:
+        return {symbol: chain for symbol, chain in option_data.groupby(level='symbol')}
+    # Unknown layout: every ticker searches the whole chain by contract symbol
+    return {ticker_symbol: option_data for ticker_symbol in unique_tickers}
+
 def get_option_values(options):
     """
     Get option values for multiple options.
@@ -47,6 +76,13 @@ def get_option_values(options):
     """
     results = []
     
+    try:
+        option_chains = get_option_chains([option['ticker'] for option in options])
+    except Exception as e:
+        return pd.DataFrame([{**option, 'contract_symbol': None, 'value': None, 'error': str(e)} for option in options])
+    # Chains indexed by contract symbol, built the first time one of their options is looked up
+    contract_indices = {}
+    
     for option in options:
         ticker_symbol = option['ticker']
         expiration = datetime.strptime(option['expiration'], '%Y-%m-%d')
@@ -58,10 +94,9 @@ def get_option_values(options):
         strike_str = format_strike_for_symbol(strike)
         contract_symbol = f"{ticker_symbol}{expiration_str}{option_type[0]}{strike_str}"
         
-        ticker = Ticker(ticker_symbol)
-        option_data = ticker.option_chain
+        option_data = option_chains.get(ticker_symbol)
         
-        if option_data is None or option_data.empty:
+        if option_data is None:
             results.append({**option, 'contract_symbol': contract_symbol, 'value': None, 'error': "No option data available"})
             continue
         
@@ -69,7 +104,13 @@ def get_option_values(options):
             if 'contractSymbol' in option_data.index.names:
                 contract_data = option_data.xs(contract_symbol, level='contractSymbol')
             elif 'contractSymbol' in option_data.columns:
-                contract_data = option_data[option_data['contractSymbol'] == contract_symbol]
+                by_contract = contract_indices.get(ticker_symbol)
+                if by_contract is None:
+                    by_contract = contract_indices[ticker_symbol] = option_data.set_index('contractSymbol')
+                if contract_symbol in by_contract.index:
+                    contract_data = by_contract.loc[[contract_symbol]]
+                else:
+                    contract_data = by_contract.iloc[:0]
             else:
                 results.append({**option, 'contract_symbol': contract_symbol, 'value': None, 'error': "Contract symbol not found in data structure"})
                 continue
@@ -96,6 +137,22 @@ def get_option_values(options):
     
     return pd.DataFrame(results)
 
+def fetch_quotes(tickers, options, currency_pair=None):
+    """
+    Fetch stock prices, option values and optionally an exchange rate concurrently.
+    
+    :param tickers: list of str, stock ticker symbols
+    :param options: list of option dicts, as taken by get_option_values
+    :param currency_pair: str or None, e.g., "USDCAD"
+    :return: tuple (stock price DataFrame, option value DataFrame, get_fx_rate result or None)
+    """
+    # The requests are independent, so each waits on the network in its own thread
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        stock_future = executor.submit(get_stock_last_price, tickers)
+        option_future = executor.submit(get_option_values, options)
+        fx_future = executor.submit(get_fx_rate, currency_pair) if currency_pair else None
+        return stock_future.result(), option_future.result(), fx_future.result() if fx_future else None
+
 def get_fx_rate(currency_pair):
     """
     Get the current exchange rate for a currency pair.